@@ -0,0 +1,405 @@
+"""
+轻量 HTTP API：KPI / 推荐 / 预测
+只依赖 Python 标准库 + pandas/numpy，和 Streamlit 页面共用同一套数据层
+
+运行:
+    python api.py --port 8000 --workers 2
+
+接口（均为 GET，format=json 默认，format=arrow 需要 pyarrow）:
+    /health
+    /attractions
+    /kpis?start=2022-06-01&end=2022-06-30&attractions=Roller Coaster,Zipline&by_attraction=1
+    /kpis?start=2022-06-01&end=2022-06-30&baselines=previous,same_period_2019&freq=M
+    /recommendations?date=2022-06-15&attractions=Roller Coaster
+    /forecast?start=2022-07-27&end=2022-08-02&attractions=Roller Coaster
+    /notifications?date=2022-07-27&slot=14:30
+    /capacity_plan?date=2022-06-15&staff_limit=60
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from data.aggregate_store import KPIS
+from data.comparison import compare
+from data.join_service import add_event_features
+from data.loader import DATA_END_DATE
+from data.shared import build_join_indexes, build_shared_state, slice_rows
+from models.model_loader import forecast_wait_times, load_wait_model
+from services.capacity_optimizer import fit_demand_model, optimise_park_day
+from services.notifications import build_notification_engine, open_slot_mask, predictions_from_forecast
+from services.recommendations import recommend_units
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow 输出为可选功能
+    pa = None
+
+# -----------------------------
+# 共享数据：父进程加载一次，fork 出的 worker 直接继承（写时复制，只读数组不复制）；
+# 没有 fork 的平台退回每个 worker 在 initializer 里各自加载
+# -----------------------------
+_STATE = {}
+_STATE_LOCK = threading.Lock()
+_EXECUTOR = None
+
+
+def get_state():
+    """
+    加载历史 + 假数据，构建运营日历和预聚合存储
+    明细按日期排序，单日查询用 searchsorted 切片，不做全表过滤
+    """
+    with _STATE_LOCK:
+        if not _STATE:
+            _STATE.update(build_shared_state())
+            df_all = _STATE["rows"]
+            _STATE["notifier"] = build_notification_engine(df_all)
+            _STATE["demand_model"] = fit_demand_model(df_all)
+            _STATE["wait_model"] = load_wait_model()
+            _STATE["weather"], _STATE["shows"] = build_join_indexes()
+    return _STATE
+
+
+def _init_worker():
+    """进程池 initializer：worker 启动时加载数据，第一个请求不用等"""
+    get_state()
+
+
+def _ping(_=None):
+    return os.getpid()
+
+
+def rows_for_date(date):
+    """某一天的明细（按日期排好序的切片）"""
+    return slice_rows(get_state(), date)
+
+
+# -----------------------------
+# 参数解析
+# -----------------------------
+def _date_param(params, name, default=None):
+    value = params.get(name, default)
+    if value is None:
+        raise ValueError(f"Missing required parameter: {name}")
+    return pd.Timestamp(value).normalize()
+
+
+def _list_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _bool_param(params, name):
+    return params.get(name, "0").lower() in ("1", "true", "yes")
+
+
+# -----------------------------
+# 接口实现：返回 DataFrame
+# -----------------------------
+def handle_health(params):
+    state = get_state()
+    return pd.DataFrame([{
+        "status": "ok",
+        "rows": len(state["rows"]),
+        "attractions": len(state["store"].attractions),
+        "start": state["store"].start,
+        "end": state["store"].end,
+    }])
+
+
+def handle_attractions(params):
+    return pd.DataFrame({"attraction": get_state()["store"].attractions})
+
+
+def handle_kpis(params):
+    """区间 KPI；带 baselines 参数时返回对比引擎结果"""
+    state = get_state()
+    start = _date_param(params, "start")
+    end = _date_param(params, "end", params.get("start"))
+    attractions = _list_param(params, "attractions")
+    baselines = _list_param(params, "baselines")
+
+    if baselines:
+        return compare(state["store"], start, end, attractions, baselines=baselines, calendar=state["calendar"],
+                       freq=params.get("freq"), rolling_periods=int(params.get("rolling_periods", 4)))
+
+    store = state["store"]
+    by_attraction = _bool_param(params, "by_attraction")
+    values = store.window_kpis([start], [end], attractions, by_attraction=by_attraction)
+    if by_attraction:
+        names = [store.attractions[i] for i in store.attraction_rows(attractions)]
+        result = pd.DataFrame({kpi: values[kpi][:, 0] for kpi in KPIS})
+        result.insert(0, "attraction", names)
+    else:
+        result = pd.DataFrame({kpi: values[kpi] for kpi in KPIS})
+    result.insert(0, "end", end)
+    result.insert(0, "start", start)
+    return result
+
+
+def handle_recommendations(params):
+    """单日各景点分时段推荐单元数"""
+    date = _date_param(params, "date")
+    day_df = rows_for_date(date)
+    attractions = _list_param(params, "attractions") or sorted(day_df["attraction"].dropna().unique())
+
+    tables = []
+    for attraction in attractions:
+        filtered_df = day_df[day_df["attraction"] == attraction]
+        if filtered_df.empty:
+            continue
+        table_df, _, _ = recommend_units(filtered_df)
+        table_df.insert(0, "attraction", attraction)
+        tables.append(table_df)
+    if not tables:
+        raise ValueError(f"No data for {date.date()}")
+    return pd.concat(tables, ignore_index=True)
+
+
+def handle_capacity_plan(params):
+    """
+    单日全园单元方案（目标利用率 85%），可选每时段人员上限 staff_limit
+    需求：历史日期用当天实际等待时间，之后的日期用模型预测（同 /forecast）；容量来自当天明细
+    """
+    date = _date_param(params, "date")
+    day_df = rows_for_date(date)
+    if day_df.empty:
+        raise ValueError(f"No data for {date.date()}")
+    staff_limit = float(params["staff_limit"]) if params.get("staff_limit") else None
+    if date <= DATA_END_DATE:
+        wait_df, source = day_df, "actual"
+    else:
+        wait_df, source = wait_forecast(date), "forecast"
+    plan = optimise_park_day(day_df, wait_df, get_state()["demand_model"], staff_limit=staff_limit)
+    plan["demand_source"] = source
+    attractions = _list_param(params, "attractions")
+    return plan[plan["attraction"].isin(attractions)] if attractions else plan
+
+
+def wait_forecast(start, end=None, attractions=None):
+    """
+    [start, end] 内各景点各时刻的等待时间预测（调好的 XGBoost 模型，特征来自共享明细）
+    没有模型时抛 FileNotFoundError（503），不返回模拟数据
+    """
+    state = get_state()
+    if state["wait_model"] is None:
+        raise FileNotFoundError("No tuned wait-time model (models/XGBoost_tuned.json); "
+                                "run `python -m models.tuning` first")
+    rows = slice_rows(state, start, end)
+    if attractions:
+        rows = rows[rows["attraction"].isin(attractions)]
+    if rows.empty:
+        raise ValueError(f"No rows to forecast between {start.date()} and {(end or start).date()}")
+    return forecast_wait_times(rows, state["wait_model"], state["weather"], state["shows"])
+
+
+def handle_forecast(params):
+    """区间内各景点的等待时间预测 + 对应时刻的天气和表演特征（join 服务整批查询）"""
+    state = get_state()
+    start = _date_param(params, "start", params.get("date"))
+    end = _date_param(params, "end", params.get("start", params.get("date")))
+    if end < start:
+        raise ValueError("end must not be before start")
+    forecast_df = wait_forecast(start, end, _list_param(params, "attractions"))
+    forecast_df = forecast_df.sort_values(["attraction", "date"], kind="stable", ignore_index=True)
+    return add_event_features(forecast_df, state["weather"], state["shows"], time_col="date")
+
+
+def handle_notifications(params):
+    """
+    某天（可选某个时段 slot=HH:MM）的低等待时间通知候选
+    预测同 /forecast；每个时段按运营日历屏蔽未开放的景点，没有历史的 (星期, 小时) 不推送
+    """
+    state = get_state()
+    date = _date_param(params, "date")
+    engine = state["notifier"]
+
+    slots, predicted = predictions_from_forecast(engine, wait_forecast(date, attractions=engine.attractions))
+    if "slot" in params:
+        keep = slots.strftime("%H:%M") == params["slot"]
+        slots, predicted = slots[keep], predicted[keep]
+    return engine.candidates(slots, predicted, open_slot_mask(state["calendar"], engine.attractions, slots))
+
+
+ROUTES = {
+    "/health": handle_health,
+    "/attractions": handle_attractions,
+    "/kpis": handle_kpis,
+    "/recommendations": handle_recommendations,
+    "/capacity_plan": handle_capacity_plan,
+    "/forecast": handle_forecast,
+    "/notifications": handle_notifications,
+}
+
+
+# -----------------------------
+# 编码 & 缓存
+# -----------------------------
+def encode_frame(df, fmt):
+    """DataFrame -> (content_type, bytes)；JSON 用 split 格式（列名只出现一次）"""
+    if fmt == "arrow":
+        if pa is None:
+            raise ValueError("Arrow output requires pyarrow")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return "application/vnd.apache.arrow.stream", sink.getvalue().to_pybytes()
+    if fmt != "json":
+        raise ValueError(f"Unknown format: {fmt}")
+    return "application/json", df.to_json(orient="split", index=False, date_format="iso").encode("utf-8")
+
+
+@lru_cache(maxsize=1024)
+def cached_response(path, fmt, items):
+    """同一请求只计算一次，高频轮询直接命中缓存"""
+    return encode_frame(ROUTES[path](dict(items)), fmt)
+
+
+def _json_error(status, message):
+    return status, "application/json", json.dumps({"error": message}).encode("utf-8")
+
+
+def respond(method, target):
+    """在 worker 进程里执行：路由 + 计算 + 编码"""
+    url = urlsplit(target)
+    if method != "GET":
+        return _json_error(HTTPStatus.METHOD_NOT_ALLOWED, "Only GET is supported")
+    if url.path not in ROUTES:
+        return _json_error(HTTPStatus.NOT_FOUND, f"Unknown endpoint: {url.path}")
+
+    params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    fmt = params.pop("format", "json")
+    try:
+        content_type, body = cached_response(url.path, fmt, tuple(sorted(params.items())))
+    except (ValueError, KeyError, TypeError) as e:
+        return _json_error(HTTPStatus.BAD_REQUEST, str(e))
+    except FileNotFoundError as e:  # 模型 / 数据文件缺失
+        return _json_error(HTTPStatus.SERVICE_UNAVAILABLE, str(e))
+    except Exception as e:  # 其他异常返回 500，不断开连接
+        return _json_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}")
+    return HTTPStatus.OK, content_type, body
+
+
+# -----------------------------
+# asyncio HTTP/1.1 服务（支持 keep-alive）
+# -----------------------------
+async def write_response(writer, status, content_type, body, keep_alive):
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+async def read_request(reader):
+    """
+    读一个请求，返回 (method, target, version, headers)；连接已关闭返回 None
+    请求行 / Content-Length 格式错误抛 ValueError
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise ValueError(f"Malformed request line: {request_line[:100]!r}")
+    method, target, version = parts
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise ValueError("Malformed Content-Length header") from None
+    if length < 0:
+        raise ValueError("Malformed Content-Length header")
+    if length:
+        await reader.readexactly(length)
+    return method, target, version, headers
+
+
+async def handle_connection(reader, writer):
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except ValueError as e:
+                # 请求格式错误：回 400 后关闭连接（后续字节无法可靠分帧）
+                await write_response(writer, *_json_error(HTTPStatus.BAD_REQUEST, str(e)), keep_alive=False)
+                break
+            if request is None:
+                break
+            method, target, version, headers = request
+
+            # 计算放到进程池，事件循环只负责收发
+            try:
+                status, content_type, body = await loop.run_in_executor(_EXECUTOR, respond, method, target)
+            except Exception as e:  # worker 进程崩溃等
+                status, content_type, body = _json_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}")
+
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            await write_response(writer, status, content_type, body, keep_alive)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port):
+    server = await asyncio.start_server(handle_connection, host, port)
+    print(f"🎢 API listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    global _EXECUTOR
+    parser = argparse.ArgumentParser(description="Theme park KPI / forecast API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    # 默认 2 个 worker：每个 worker 各有一份响应缓存，worker 越多命中率越低
+    parser.add_argument("--workers", type=int, default=min(2, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    # 路由里的 pandas 过滤 / groupby / 编码大部分持有 GIL，线程池并发时基本串行，改用进程池，
+    # 请求只传 URL、回传编码好的 bytes。
+    # 能 fork 时数据只在父进程构建一次，worker 继承同一份内存；否则每个 worker 在 initializer 里加载
+    if "fork" in multiprocessing.get_all_start_methods():
+        get_state()
+        _EXECUTOR = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("fork"))
+    else:
+        _EXECUTOR = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker)
+    # 启动时把所有 worker 拉起来并完成加载，避免第一批请求超时
+    pids = set(_EXECUTOR.map(_ping, range(args.workers)))
+    print(f"✅ {len(pids)} workers ready")
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _EXECUTOR.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 import streamlit as st  # 确保 st 在最上方被导入
 import pandas as pd
-from pages import yearly, monthly, daily, weekly
+from pages import yearly, monthly, daily, weekly, replay
 
 # ✅ 将 st.set_page_config 放在最前面
 st.set_page_config(
@@ -11,7 +11,7 @@ st.set_page_config(
 
 # 侧边栏导航
 st.sidebar.title("📊 Dashboard Navigation")
-page = st.sidebar.radio("Go to", ["Yearly", "Monthly", "Weekly", "Daily"])
+page = st.sidebar.radio("Go to", ["Yearly", "Monthly", "Weekly", "Daily", "Replay"])
 
 # 选择页面
 if page == "Yearly":
@@ -22,3 +22,5 @@ elif page == "Weekly":
     weekly.show()
 elif page == "Daily":
     daily.show()
+elif page == "Replay":
+    replay.show()
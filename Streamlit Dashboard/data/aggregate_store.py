@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# 预聚合存储
+#   景点 × 日 的稠密数组，沿日期做前缀和：
+#   任意日期区间、任意景点集合的 KPI 都是一次向量化的数组下标运算，
+#   不再对原始 15 分钟记录做过滤和 groupby
+# -----------------------------
+
+KPIS = ("attendance", "avg_wait", "peak_wait", "capacity_utilization")
+
+_ARRAYS = ("wait_sum", "wait_count", "wait_max", "util_sum", "util_count", "park_attendance", "present")
+
+
+def _prefix(values):
+    """沿最后一维做前缀和，前面补 0：区间和 = p[i1] - p[i0]"""
+    pad = np.zeros(values.shape[:-1] + (1,), dtype=np.float64)
+    return np.concatenate([pad, np.cumsum(values, axis=-1, dtype=np.float64)], axis=-1)
+
+
+class AggregateStore:
+    """
+    预聚合存储
+    - wait_sum / wait_count / wait_max   : (景点, 日) 等待时间合计 / 记录数 / 最大值
+    - util_sum / util_count              : (景点, 日) 容量利用率合计 / 记录数
+    - park_attendance                    : (日,) 全园当日客流
+    - present                            : (景点, 日) 当日是否有该景点记录
+    区间和用前缀和，区间最大值用稀疏表，都是 O(1)
+    """
+
+    def __init__(self, start, attractions, wait_sum, wait_count, wait_max, util_sum, util_count,
+                 park_attendance, present):
+        self.start = pd.Timestamp(start).normalize()
+        self.attractions = list(attractions)
+        self.attraction_index = {name: i for i, name in enumerate(self.attractions)}
+        self.wait_sum = np.asarray(wait_sum, dtype=np.float64)
+        self.wait_count = np.asarray(wait_count, dtype=np.float64)
+        self.wait_max = np.asarray(wait_max, dtype=np.float64)
+        self.util_sum = np.asarray(util_sum, dtype=np.float64)
+        self.util_count = np.asarray(util_count, dtype=np.float64)
+        self.park_attendance = np.asarray(park_attendance, dtype=np.float64)
+        self.present = np.asarray(present, dtype=bool)
+        self.n_days = self.present.shape[1]
+        self.end = self.start + pd.Timedelta(days=self.n_days - 1)
+
+        self._wait_sum = _prefix(self.wait_sum)
+        self._wait_count = _prefix(self.wait_count)
+        self._util_sum = _prefix(self.util_sum)
+        self._util_count = _prefix(self.util_count)
+        self._attendance = _prefix(self.present * self.park_attendance)
+
+        # 稀疏表：_max_table[k][:, i] = max(wait_max[:, i : i + 2**k])
+        table = [np.where(self.present, self.wait_max, -np.inf)]
+        k = 1
+        while (1 << k) <= self.n_days:
+            prev, half = table[-1], 1 << (k - 1)
+            table.append(np.maximum(prev[:, :-half], prev[:, half:]))
+            k += 1
+        self._max_table = table
+
+    # -----------------------------
+    # 下标换算
+    # -----------------------------
+    def offset(self, date):
+        """日期 -> 日下标（可能越界，查询时会裁剪）"""
+        return (pd.Timestamp(date).normalize() - self.start).days
+
+    def attraction_rows(self, attractions=None):
+        """景点名列表 -> 行下标数组，None 表示全部景点，未知景点忽略"""
+        if attractions is None:
+            return np.arange(len(self.attractions))
+        if isinstance(attractions, str):
+            attractions = [attractions]
+        return np.array([self.attraction_index[a] for a in attractions if a in self.attraction_index],
+                        dtype=np.int64)
+
+    # -----------------------------
+    # 查询
+    # -----------------------------
+    def _range_max(self, rows, i0, i1):
+        """半开区间 [i0, i1) 的最大等待时间，(景点, 窗口)"""
+        out = np.full((len(rows), len(i0)), -np.inf)
+        length = i1 - i0
+        nonempty = length > 0
+        levels = np.zeros(len(i0), dtype=np.int64)
+        levels[nonempty] = np.floor(np.log2(length[nonempty])).astype(np.int64)
+        for k in np.unique(levels[nonempty]):
+            w = np.flatnonzero(nonempty & (levels == k))
+            table = self._max_table[k][rows]
+            out[:, w] = np.maximum(table[:, i0[w]], table[:, i1[w] - (1 << k)])
+        return out
+
+    def window_kpis(self, starts, ends, attractions=None, by_attraction=False):
+        """
+        一次查询多个闭区间窗口 [starts[j], ends[j]] 的 KPI
+        starts / ends: 日期或日下标数组
+        返回 {kpi: ndarray}，形状为 (窗口,)；by_attraction=True 时为 (景点, 窗口)
+        没有数据的窗口为 NaN
+        """
+        rows = self.attraction_rows(attractions)
+        i0 = np.array([s if isinstance(s, (int, np.integer)) else self.offset(s) for s in starts], dtype=np.int64)
+        i1 = np.array([e if isinstance(e, (int, np.integer)) else self.offset(e) for e in ends], dtype=np.int64) + 1
+        i0 = np.clip(i0, 0, self.n_days)
+        i1 = np.maximum(np.clip(i1, 0, self.n_days), i0)
+
+        def total(prefix):
+            p = prefix[rows]
+            return p[:, i1] - p[:, i0]
+
+        wait_sum = total(self._wait_sum)
+        wait_count = total(self._wait_count)
+        util_sum = total(self._util_sum)
+        util_count = total(self._util_count)
+        peak = self._range_max(rows, i0, i1)
+
+        if by_attraction:
+            attendance = total(self._attendance)
+        else:
+            wait_sum, wait_count = wait_sum.sum(axis=0), wait_count.sum(axis=0)
+            util_sum, util_count = util_sum.sum(axis=0), util_count.sum(axis=0)
+            peak = peak.max(axis=0) if len(rows) else np.full(len(i0), -np.inf)
+            # 全园客流按“任一所选景点有记录的日期”计一次，避免多景点重复累加
+            union = self.present[rows].any(axis=0)
+            p = _prefix(union * self.park_attendance)
+            attendance = p[i1] - p[i0]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return {
+                "attendance": np.where(wait_count > 0, attendance, np.nan),
+                "avg_wait": np.where(wait_count > 0, wait_sum / wait_count, np.nan),
+                "peak_wait": np.where(np.isfinite(peak), peak, np.nan),
+                "capacity_utilization": np.where(util_count > 0, util_sum / util_count, np.nan),
+            }
+
+    def kpis(self, start, end, attractions=None):
+        """单个窗口的 KPI，返回 {kpi: float}"""
+        values = self.window_kpis([start], [end], attractions)
+        return {kpi: float(v[0]) for kpi, v in values.items()}
+
+    # -----------------------------
+    # 持久化
+    # -----------------------------
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            start=np.array(str(self.start.date())),
+            attractions=np.array(self.attractions),
+            **{name: getattr(self, name) for name in _ARRAYS}
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=False)
+        return cls(
+            pd.Timestamp(str(data["start"])),
+            data["attractions"].tolist(),
+            **{name: data[name] for name in _ARRAYS}
+        )
+
+
+def build_aggregate_store(df, date_col="date", attraction_col="attraction"):
+    """
+    从 15 分钟明细构建预聚合存储（只做一次 groupby）
+    df 需包含 date / attraction / wait_time_max / capacity_utilization / attendance
+    """
+    dates = pd.to_datetime(df[date_col], errors="coerce").dt.normalize()
+    valid = dates.notna() & df[attraction_col].notna()
+    dates = dates[valid]
+    names = df.loc[valid, attraction_col].astype(str)
+
+    start, end = dates.min(), dates.max()
+    n_days = (end - start).days + 1
+    attractions = sorted(names.unique())
+
+    frame = pd.DataFrame({
+        "a": pd.Categorical(names, categories=attractions).codes,
+        "d": ((dates - start) // pd.Timedelta(days=1)).astype(np.int64),
+        "wait": df.loc[valid, "wait_time_max"].astype(float),
+        "util": df.loc[valid, "capacity_utilization"].astype(float),
+    })
+    grouped = frame.groupby(["a", "d"]).agg(
+        wait_sum=("wait", "sum"),
+        wait_count=("wait", "count"),
+        wait_max=("wait", "max"),
+        util_sum=("util", "sum"),
+        util_count=("util", "count"),
+    )
+    a = grouped.index.get_level_values("a").to_numpy()
+    d = grouped.index.get_level_values("d").to_numpy()
+
+    shape = (len(attractions), n_days)
+    arrays = {}
+    for col in ["wait_sum", "wait_count", "wait_max", "util_sum", "util_count"]:
+        dense = np.zeros(shape, dtype=np.float64)
+        dense[a, d] = grouped[col].to_numpy()
+        arrays[col] = dense
+    present = np.zeros(shape, dtype=bool)
+    present[a, d] = True
+
+    # 全园客流：每天取第一条记录（与页面 groupby("date").first() 一致）
+    daily_attendance = df.loc[valid, "attendance"].groupby(frame["d"].to_numpy()).first()
+    park_attendance = np.zeros(n_days, dtype=np.float64)
+    park_attendance[daily_attendance.index.to_numpy()] = daily_attendance.fillna(0).to_numpy()
+
+    return AggregateStore(start, attractions, park_attendance=park_attendance, present=present, **arrays)
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+from data.aggregate_store import KPIS
+from data.operating_calendar import period_bounds
+
+# -----------------------------
+# 对比引擎
+#   基于预聚合存储，把当前周期和多个基准周期放进一次向量化查询：
+#   - previous               : 上一个开放周期
+#   - same_weekday_last_year : 去年同期（日 / 周往前 52 周保持星期对齐，月 / 年往前一年）
+#   - same_period_2019       : 2019 年同期（疫情前）
+#   - rolling                : 前 N 个开放周期的均值
+#   基准窗口和当前窗口重叠时（例如 2019 年对比 2019 年同期）不返回该基准
+#   客流是区间合计，各窗口开放天数不同，先按开放日折算成日均再对比
+# -----------------------------
+
+BASELINES = {
+    "previous": "Previous period",
+    "same_weekday_last_year": "Same weekday last year",
+    "same_period_2019": "Same period in 2019 (pre-COVID)",
+    "rolling": "Rolling baseline",
+}
+
+REFERENCE_YEAR = 2019
+ONE_DAY = pd.Timedelta(days=1)
+ONE_WEEK = pd.Timedelta(days=7)
+SUMMED_KPIS = ("attendance",)  # 区间合计型 KPI，按开放日折算后对比
+
+
+def _previous_window(start, end, calendar=None, freq=None, attractions=None):
+    """紧邻的上一个周期；有日历时跳过闭园 / 缺失的周期（指定景点时按景点自己的开放日）"""
+    length = end - start + ONE_DAY
+    if calendar is not None:
+        if freq is not None:
+            return calendar.previous_open_period(start, freq, attractions)
+        prev_day = calendar.previous_open_day(start, attractions)
+        return None if prev_day is None else (prev_day - length + ONE_DAY, prev_day)
+    if freq is not None:
+        return period_bounds(start - ONE_DAY, freq)
+    return start - length, end - length
+
+
+def _drop_overlap(windows, start, end):
+    """去掉与当前窗口 [start, end] 重叠的基准窗口（自己和自己比没有意义）"""
+    return [(s, e) for s, e in windows if e < start or s > end]
+
+
+def baseline_windows(start, end, baseline, calendar=None, freq=None, rolling_periods=4, attractions=None):
+    """
+    计算某个基准对应的日期窗口列表 [(开始, 结束), ...]
+    freq 为 "D" / "W" / "M" / "Y" 时按自然周期对齐，None 时按窗口长度平移
+    """
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+
+    if baseline == "previous":
+        window = _previous_window(start, end, calendar, freq, attractions)
+        return [] if window is None else _drop_overlap([window], start, end)
+
+    if baseline == "same_weekday_last_year":
+        if freq in ("M", "Y") or (freq is None and end - start >= ONE_WEEK):
+            # 月 / 年（或超过一周的自定义窗口）按日历往前一年，52 周会差 1~2 天
+            last_year = start - pd.DateOffset(years=1)
+            window = period_bounds(last_year, freq) if freq is not None else (last_year, end - pd.DateOffset(years=1))
+        else:
+            shift = pd.Timedelta(weeks=52)
+            window = (start - shift, end - shift)
+        return _drop_overlap([window], start, end)
+
+    if baseline == "same_period_2019":
+        offset = pd.DateOffset(years=start.year - REFERENCE_YEAR)
+        return _drop_overlap([(start - offset, end - offset)], start, end)
+
+    if baseline == "rolling":
+        windows = []
+        window = (start, end)
+        for _ in range(rolling_periods):
+            window = _previous_window(window[0], window[1], calendar, freq, attractions)
+            if window is None:
+                break
+            windows.append(window)
+        return _drop_overlap(windows, start, end)
+
+    raise ValueError(f"Unknown baseline: {baseline}")
+
+
+def _open_days(store, windows, attractions=None, calendar=None):
+    """
+    每个窗口的开放天数 (窗口,)
+    有日历时按日历（指定景点时按景点自己的开放日），否则按存储里有记录的日期
+    """
+    if calendar is not None:
+        return np.array([calendar.open_days_between(s, e, attractions) for s, e in windows], dtype=np.float64)
+    rows = store.attraction_rows(attractions)
+    union = store.present[rows].any(axis=0) if len(rows) else np.zeros(store.n_days, dtype=bool)
+    p = np.concatenate([[0], np.cumsum(union)])
+    i0 = np.clip([store.offset(s) for s, _ in windows], 0, store.n_days)
+    i1 = np.maximum(np.clip([store.offset(e) + 1 for _, e in windows], 0, store.n_days), i0)
+    return (p[i1] - p[i0]).astype(np.float64)
+
+
+def _delta_percent(current, previous):
+    if not np.isfinite(current) or not np.isfinite(previous) or previous == 0:
+        return None
+    return round((current - previous) / abs(previous) * 100.0, 2)
+
+
+def compare(store, start, end, attractions=None, baselines=tuple(BASELINES), calendar=None, freq=None,
+            rolling_periods=4, kpis=KPIS):
+    """
+    当前周期 [start, end] 与各基准的对比，所有窗口一次查询完成
+    返回长表: baseline / baseline_start / baseline_end / kpi / current / baseline_value / delta_pct
+    客流 (SUMMED_KPIS) 的 current / baseline_value 为开放日日均；没有可用基准时 delta_pct 为 None
+    """
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+
+    windows = [(start, end)]
+    owners = [None]
+    for baseline in baselines:
+        for window in baseline_windows(start, end, baseline, calendar, freq, rolling_periods, attractions):
+            windows.append(window)
+            owners.append(baseline)
+
+    values = store.window_kpis([w[0] for w in windows], [w[1] for w in windows], attractions)
+    summed = [kpi for kpi in kpis if kpi in SUMMED_KPIS]
+    if summed:
+        days = _open_days(store, windows, attractions, calendar)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for kpi in summed:
+                values[kpi] = np.where(days > 0, values[kpi] / days, np.nan)
+    owners = np.array(owners, dtype=object)
+
+    rows = []
+    for baseline in baselines:
+        idx = np.flatnonzero(owners == baseline)
+        for kpi in kpis:
+            current = values[kpi][0]
+            base = values[kpi][idx]
+            base = base[np.isfinite(base)]
+            base_value = float(base.mean()) if len(base) else np.nan
+            rows.append({
+                "baseline": baseline,
+                "baseline_start": min(windows[i][0] for i in idx) if len(idx) else pd.NaT,
+                "baseline_end": max(windows[i][1] for i in idx) if len(idx) else pd.NaT,
+                "kpi": kpi,
+                "current": float(current),
+                "baseline_value": base_value,
+                "delta_pct": _delta_percent(current, base_value),
+            })
+    return pd.DataFrame(rows)
+
+
+def delta_map(result, baseline):
+    """compare() 结果 -> {kpi: delta_pct}，页面显示 delta 用"""
+    sub = result[result["baseline"] == baseline]
+    return {row.kpi: None if pd.isna(row.delta_pct) else row.delta_pct for row in sub.itertuples()}
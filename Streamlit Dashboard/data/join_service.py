@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+from data.operating_calendar import _to_ns
+
+# -----------------------------
+# 时间索引 join 服务：天气 + 巡游 / 夜场表演
+#   天气按 dt_iso 排好序的 int64 数组，“t 时刻的天气” = 向后 searchsorted（等价于 merge_asof backward）
+#   表演按日期排好序，每天的表演时间预先解析成“当天第几分钟”，整批时间戳一次 searchsorted
+#   训练（models/tuning.py）和实时预测（api.py）共用
+# -----------------------------
+
+WEATHER_COLUMNS = ["temp", "dew_point", "feels_like", "humidity", "wind_speed", "rain_1h", "snow_1h"]
+SHOW_EVENTS = ["PARADE_1", "PARADE_2", "NIGHT_SHOW"]
+NO_EVENT = 9999         # 当天没有该表演时的 TIME_TO_* 填充值（同 notebook）
+PROXIMITY_WINDOW = 60   # |TIME_TO_*| <= 60 分钟 => NEAR_* = 1
+SHOW_DURATION = pd.Timedelta(minutes=15)
+
+_NS_PER_MINUTE = 60 * 10**9
+_NS_PER_DAY = 24 * 60 * _NS_PER_MINUTE
+
+
+def _valid_ns(timestamps):
+    """时间戳 -> (int64 纳秒, 非 NaT 标记)"""
+    t_ns = _to_ns(timestamps)
+    return t_ns, t_ns != np.iinfo(np.int64).min
+
+
+class WeatherIndex:
+    """
+    times: 排好序的观测时间 (int64 纳秒)
+    values: {列名: 数组}，与 times 对齐
+    """
+
+    def __init__(self, times, values):
+        self.times = np.asarray(times, dtype=np.int64)
+        self.values = {col: np.asarray(arr) for col, arr in values.items()}
+        self.columns = list(self.values)
+
+    def positions(self, timestamps, tolerance=None):
+        """每个时间戳对应的最近一条（不晚于它的）观测下标，没有则为 -1"""
+        t_ns, ok = _valid_ns(timestamps)
+        pos = np.searchsorted(self.times, t_ns, side="right") - 1
+        ok &= pos >= 0
+        if tolerance is not None:
+            ok &= t_ns - self.times[np.maximum(pos, 0)] <= pd.Timedelta(tolerance).value
+        return np.where(ok, pos, -1)
+
+    def at(self, timestamps, columns=None, tolerance=None):
+        """整批时间戳的天气，返回 DataFrame（行顺序同输入）"""
+        pos = self.positions(timestamps, tolerance)
+        found = pos >= 0
+        result = {}
+        for col in columns or self.columns:
+            values = self.values[col]
+            if values.dtype.kind in "fiub":
+                result[col] = np.where(found, values[np.maximum(pos, 0)].astype(np.float64), np.nan)
+            else:
+                result[col] = np.where(found, values[np.maximum(pos, 0)], None)
+        return pd.DataFrame(result)
+
+
+class ShowScheduleIndex:
+    """
+    dates: 排好序的日期 (int64 纳秒，当天 00:00)
+    minutes: (D, E) 每天各表演开始于当天第几分钟，NaN 表示当天没有
+    """
+
+    def __init__(self, dates, minutes, events=SHOW_EVENTS):
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.minutes = np.asarray(minutes, dtype=np.float64).reshape(len(self.dates), -1)
+        self.events = list(events)
+
+    def _lookup(self, timestamps):
+        """-> (当天表演分钟 (N, E), 时间戳在当天的分钟 (N,))；没有当天记录的行为 NaN"""
+        t_ns, ok = _valid_ns(timestamps)
+        day = t_ns - t_ns % _NS_PER_DAY
+        pos = np.clip(np.searchsorted(self.dates, day), 0, max(len(self.dates) - 1, 0))
+        ok &= len(self.dates) > 0
+        if len(self.dates):
+            ok &= self.dates[pos] == day
+
+        shows = np.full((len(t_ns), len(self.events)), np.nan)
+        if len(self.dates):
+            shows[ok] = self.minutes[pos[ok]]
+        minute_of_day = (t_ns - day) / _NS_PER_MINUTE
+        return shows, minute_of_day
+
+    def minutes_to(self, timestamps):
+        """到当天各表演的分钟数 (N, E)，已经开始为负数，当天没有为 NaN"""
+        shows, minute_of_day = self._lookup(timestamps)
+        return shows - minute_of_day[:, None]
+
+    def minutes_to_next(self, timestamps):
+        """到当天下一场（任意）表演的分钟数 (N,)，之后没有表演为 NaN"""
+        delta = self.minutes_to(timestamps)
+        delta = np.where(delta >= 0, delta, np.inf)
+        nearest = delta.min(axis=1) if delta.shape[1] else np.full(len(delta), np.inf)
+        return np.where(np.isfinite(nearest), nearest, np.nan)
+
+    def features(self, timestamps, window=PROXIMITY_WINDOW):
+        """notebook 同款特征：TIME_TO_* (没有为 9999) 和 NEAR_* (|TIME_TO_*| <= window)"""
+        delta = self.minutes_to(timestamps)
+        result = {}
+        for j, event in enumerate(self.events):
+            time_to = np.where(np.isnan(delta[:, j]), NO_EVENT, delta[:, j])
+            result[f"TIME_TO_{event}"] = time_to
+            result[f"NEAR_{event}"] = (np.abs(time_to) <= window).astype(int)
+        return pd.DataFrame(result)
+
+    def slot_flags(self, starts, ends, duration=SHOW_DURATION):
+        """
+        时段 [DEB_TIME, FIN_TIME) 与 [表演开始, 表演开始 + 15 分钟) 有重叠 => *_FLAG = 1
+        与合并数据里的 NIGHT_SHOW_FLAG / PARADE_1_FLAG / PARADE_2_FLAG 一致
+        """
+        shows, start_min = self._lookup(starts)
+        end_ns, _ = _valid_ns(ends)
+        start_ns, _ = _valid_ns(starts)
+        end_min = start_min + (end_ns - start_ns) / _NS_PER_MINUTE
+        show_end = shows + duration / pd.Timedelta(minutes=1)
+        hit = (start_min[:, None] < show_end) & (end_min[:, None] > shows)
+        return pd.DataFrame({f"{event}_FLAG": hit[:, j].astype(int) for j, event in enumerate(self.events)})
+
+
+# -----------------------------
+# 构建
+# -----------------------------
+def build_weather_index(weather_df, time_col="dt_iso", columns=None):
+    """天气表 -> WeatherIndex（按时间排序，同一时刻保留最后一条）"""
+    df = weather_df[weather_df[time_col].notna()]
+    df = df.sort_values(time_col, kind="stable").drop_duplicates(time_col, keep="last")
+    columns = [c for c in (columns or WEATHER_COLUMNS) if c in df.columns]
+    return WeatherIndex(_to_ns(df[time_col]), {col: df[col].to_numpy() for col in columns})
+
+
+def build_show_index(show_df, date_col="WORK_DATE", events=SHOW_EVENTS):
+    """
+    表演时间表 (read_show_schedule) -> ShowScheduleIndex
+    "HH:MM:SS" 一次性向量化解析，"no parade" / 缺失 => NaN
+    合并后的明细只有 *_FLAG 列、没有表演时间，不能用来构建
+    """
+    events = [e for e in events if e in show_df.columns]
+    if not events:
+        raise ValueError(f"Show schedule has none of the show time columns {list(SHOW_EVENTS)}")
+    df = show_df[show_df[date_col].notna()].drop_duplicates(date_col, keep="last")
+    df = df.sort_values(date_col, kind="stable")
+
+    minutes = np.column_stack([
+        pd.to_timedelta(df[event].astype(str), errors="coerce") / pd.Timedelta(minutes=1)
+        for event in events
+    ]) if events else np.empty((len(df), 0))
+    dates = _to_ns(pd.to_datetime(df[date_col]).dt.normalize())
+    return ShowScheduleIndex(dates, minutes, events)
+
+
+def add_event_features(df, weather=None, shows=None, time_col="DEB_TIME", weather_columns=None):
+    """
+    给明细加上天气列和表演特征（TIME_TO_* / NEAR_*），返回新的 DataFrame
+    已有同名列时覆盖
+    """
+    parts = [df.reset_index(drop=True)]
+    if weather is not None:
+        parts.append(weather.at(df[time_col], weather_columns))
+    if shows is not None:
+        parts.append(shows.features(df[time_col]))
+    result = pd.concat(parts, axis=1)
+    result = result.loc[:, ~result.columns.duplicated(keep="last")]
+    result.index = df.index
+    return result
@@ -0,0 +1,96 @@
+import os
+import pandas as pd
+
+# -----------------------------
+# 数据路径：默认放在 Streamlit Dashboard/cleaned_data 下
+# -----------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLEANED_DATA_DIR = os.path.join(BASE_DIR, "cleaned_data")
+
+HISTORICAL_DATA_PATH = os.path.join(CLEANED_DATA_DIR, "merged_final_2.csv")
+ENTITY_SCHEDULE_PATH = os.path.join(CLEANED_DATA_DIR, "entity_schedule_cleaned.csv")
+WEATHER_DATA_PATH = os.path.join(CLEANED_DATA_DIR, "weather_data_cleaned.csv")
+SHOW_SCHEDULE_PATH = os.path.join(CLEANED_DATA_DIR, "parade_night_show_cleaned.csv")
+MERGED_7_DAYS = os.path.join(BASE_DIR, "merged_df.csv")
+
+# 原始数据时间范围
+DATA_START_DATE = pd.to_datetime("2018-06-01")
+DATA_END_DATE = pd.to_datetime("2022-07-26")
+FAKE_START_DATE = pd.to_datetime("2022-07-27")  # 假数据开始
+FAKE_END_DATE = pd.to_datetime("2022-08-02")    # 假数据结束
+
+
+def read_historical_data(path=HISTORICAL_DATA_PATH):
+    """
+    读取历史数据 (merged_final_2.csv)，列名与各页面保持一致
+    不依赖 Streamlit，供 API / 批处理 / 模型脚本复用
+    """
+    df = pd.read_csv(path, encoding="utf-8", low_memory=False, on_bad_lines="skip")
+    df.rename(columns={
+        "WORK_DATE": "date",
+        "ENTITY_DESCRIPTION_SHORT": "attraction",
+        "WAIT_TIME_MAX": "wait_time_max",
+        "DEB_TIME_HOUR": "hour",
+        "DEB_TIME_ONLY": "time_slot"
+    }, inplace=True)
+
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df.fillna({"wait_time_max": 0, "attendance": 0, "GUEST_CARRIED": 0, "CAPACITY": 1, "hour": 0}, inplace=True)
+    df = df[df["date"] <= DATA_END_DATE].copy()
+    df["capacity_utilization"] = (df["GUEST_CARRIED"] / df["CAPACITY"] * 100).where(df["CAPACITY"] > 0, 0)
+    return df
+
+
+def read_fake_data(path=MERGED_7_DAYS):
+    """
+    读取 7 天假数据 (merged_df.csv)，仅保留 2022-07-27 ~ 2022-08-02
+    """
+    df = pd.read_csv(path)
+    df.rename(columns={"Date": "date", "Attraction": "attraction", "Wait_time_max": "wait_time_max"}, inplace=True)
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+
+    for col, default in [("hour", 12), ("attendance", 0), ("GUEST_CARRIED", 0), ("CAPACITY", 1)]:
+        if col not in df.columns:
+            df[col] = default
+
+    df = df[(df["date"] >= FAKE_START_DATE) & (df["date"] <= FAKE_END_DATE)].copy()
+    df["capacity_utilization"] = (df["GUEST_CARRIED"] / df["CAPACITY"] * 100).where(df["CAPACITY"] > 0, 0)
+    return df
+
+
+def read_entity_schedule(path=ENTITY_SCHEDULE_PATH):
+    """
+    读取 entity_schedule（清洗后），文件不存在时返回 None
+    """
+    if not os.path.exists(path):
+        return None
+
+    df = pd.read_csv(path)
+    for col in ["WORK_DATE", "DEB_TIME", "FIN_TIME"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df
+
+
+def read_weather_data(path=WEATHER_DATA_PATH):
+    """
+    读取天气数据（清洗后），文件不存在时返回 None
+    """
+    if not os.path.exists(path):
+        return None
+
+    df = pd.read_csv(path)
+    df["dt_iso"] = pd.to_datetime(df["dt_iso"], errors="coerce")
+    return df
+
+
+def read_show_schedule(path=SHOW_SCHEDULE_PATH):
+    """
+    读取巡游 / 夜场表演时间表（清洗后），文件不存在时返回 None
+    """
+    if not os.path.exists(path):
+        return None
+
+    df = pd.read_csv(path)
+    df["WORK_DATE"] = pd.to_datetime(df["WORK_DATE"], errors="coerce")
+    return df
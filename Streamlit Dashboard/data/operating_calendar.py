@@ -0,0 +1,352 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# 运营日历
+#   园区每日开放位图 + 各景点每日开放位图 + 各景点开放时段
+#   只构建一次，页面 delta、特征滞后、模型窗口都直接查询，
+#   不再各自扫描数据找闭园期 / 缺失日期
+# -----------------------------
+
+# COVID 闭园区间
+CLOSED_START = pd.to_datetime("2020-03-14")
+CLOSED_END = pd.to_datetime("2021-06-14")
+
+# entity_schedule 中表示正常营业的 REF_CLOSING_DESCRIPTION（清洗时 NaN 已填为该值）
+OPEN_LABEL = "Overture"
+
+ONE_DAY = pd.Timedelta(days=1)
+_EMPTY_INTERVALS = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+
+def period_bounds(date, freq):
+    """
+    返回 date 所在周期的 (开始, 结束)，均为闭区间
+    freq: "D" 天 / "W" 周(周一开始) / "M" 月 / "Y" 年
+    """
+    date = pd.Timestamp(date).normalize()
+    if freq == "D":
+        return date, date
+    if freq == "W":
+        start = date - pd.Timedelta(days=date.weekday())
+        return start, start + pd.Timedelta(days=6)
+    if freq == "M":
+        start = date.replace(day=1)
+        return start, start + pd.offsets.MonthEnd(1)
+    if freq == "Y":
+        return pd.Timestamp(year=date.year, month=1, day=1), pd.Timestamp(year=date.year, month=12, day=31)
+    raise ValueError(f"Unknown period frequency: {freq}")
+
+
+def _to_ns(timestamps):
+    """时间戳数组 -> int64 纳秒"""
+    values = pd.to_datetime(pd.Series(timestamps)).to_numpy(dtype="datetime64[ns]")
+    return values.astype(np.int64)
+
+
+def _interval_hits(intervals, t_ns):
+    """
+    t_ns 是否落在任一区间内（向量化）
+    intervals 的 ends 已做累计最大值，重叠区间也能用一次 searchsorted 判断
+    """
+    starts, ends = intervals
+    hits = np.zeros(len(t_ns), dtype=bool)
+    if len(starts) == 0:
+        return hits
+    j = np.searchsorted(starts, t_ns, side="right") - 1
+    valid = j >= 0
+    hits[valid] = t_ns[valid] < ends[j[valid]]
+    return hits
+
+
+class OperatingCalendar:
+    """
+    运营日历
+    - day_open[i]           : 第 i 天园区是否开放（有数据且不在闭园期）
+    - day_closed[i]         : 第 i 天是否处于已知闭园期
+    - attraction_open[a, i] : 景点 a 第 i 天是否开放
+    - intervals[name]       : 景点开放时段 (starts_ns, ends_ns)
+    - closures[name]        : 景点临时关闭时段 (starts_ns, ends_ns)
+    按天查询均为数组下标访问 O(1)，按时刻查询为 searchsorted
+    """
+
+    def __init__(self, start, day_open, day_closed, attractions, attraction_open,
+                 intervals=None, closures=None):
+        self.start = pd.Timestamp(start).normalize()
+        self.day_open = np.asarray(day_open, dtype=bool)
+        self.day_closed = np.asarray(day_closed, dtype=bool)
+        self.end = self.start + (len(self.day_open) - 1) * ONE_DAY
+        self.attractions = list(attractions)
+        self.attraction_index = {name: i for i, name in enumerate(self.attractions)}
+        self.attraction_open = np.asarray(attraction_open, dtype=bool)
+        self.intervals = intervals or {}
+        self.closures = closures or {}
+
+        n_days = len(self.day_open)
+        # 开放天数前缀和：任意区间开放天数 O(1)
+        self._open_cumsum = np.concatenate([[0], np.cumsum(self.day_open, dtype=np.int64)])
+        # 每天（含当天）往前最近的开放日下标，-1 表示没有
+        positions = np.where(self.day_open, np.arange(n_days), -1)
+        self._last_open = np.maximum.accumulate(positions) if n_days else positions
+        # 同上，按景点：_attraction_last_open[a, i]
+        positions = np.where(self.attraction_open, np.arange(n_days), -1)
+        self._attraction_last_open = np.maximum.accumulate(positions, axis=1) if n_days else positions
+        # 所有开放日下标，用于“第 k 个之前的开放日”
+        self._open_positions = np.flatnonzero(self.day_open)
+        self._start_d = self.start.to_datetime64().astype("datetime64[D]")
+        # _scheduled[a, i]：景点 a 第 i 天是否有开放时段记录（有则按时段判断，否则退回按天判断）
+        self._scheduled = np.zeros((len(self.attractions), n_days), dtype=bool)
+        for name, (starts, _) in self.intervals.items():
+            a = self.attraction_index.get(name)
+            if a is None or not len(starts):
+                continue
+            idx = (starts.astype("datetime64[ns]").astype("datetime64[D]") - self._start_d).astype(np.int64)
+            idx = idx[(idx >= 0) & (idx < n_days)]
+            self._scheduled[a, idx] = True
+
+    def __len__(self):
+        return len(self.day_open)
+
+    # -----------------------------
+    # 下标换算
+    # -----------------------------
+    def _raw_offset(self, date):
+        return (pd.Timestamp(date).normalize() - self.start).days
+
+    def _offset(self, date):
+        i = self._raw_offset(date)
+        return i if 0 <= i < len(self.day_open) else None
+
+    def offsets(self, dates):
+        """日期数组 -> 下标数组（越界为 -1）"""
+        days = pd.to_datetime(pd.Series(dates)).to_numpy(dtype="datetime64[D]")
+        idx = (days - self._start_d).astype(np.int64)
+        idx[(idx < 0) | (idx >= len(self.day_open))] = -1
+        return idx
+
+    def date_at(self, i):
+        return self.start + int(i) * ONE_DAY
+
+    def attraction_rows(self, attractions):
+        """景点名（或列表）-> 行下标数组，未知景点忽略"""
+        if isinstance(attractions, str):
+            attractions = [attractions]
+        return np.array([self.attraction_index[a] for a in attractions if a in self.attraction_index],
+                        dtype=np.int64)
+
+    # -----------------------------
+    # 按天查询
+    # -----------------------------
+    def is_open(self, date):
+        i = self._offset(date)
+        return i is not None and bool(self.day_open[i])
+
+    def is_closed(self, date):
+        """是否处于已知闭园期（区别于单纯缺数据）"""
+        i = self._offset(date)
+        return i is not None and bool(self.day_closed[i])
+
+    def open_mask(self, dates):
+        """日期数组 -> 是否开放（向量化）"""
+        idx = self.offsets(dates)
+        return np.where(idx >= 0, self.day_open[np.maximum(idx, 0)], False)
+
+    def is_attraction_open(self, attraction, date):
+        a = self.attraction_index.get(attraction)
+        i = self._offset(date)
+        return a is not None and i is not None and bool(self.attraction_open[a, i])
+
+    def open_days_between(self, start, end, attractions=None):
+        """
+        [start, end] 闭区间内的开放天数
+        attractions 不为 None 时按“任一所选景点开放”计
+        """
+        i0 = max(self._raw_offset(start), 0)
+        i1 = min(self._raw_offset(end) + 1, len(self.day_open))
+        if i1 <= i0:
+            return 0
+        if attractions is not None:
+            return int(self.attraction_open[self.attraction_rows(attractions), i0:i1].any(axis=0).sum())
+        return int(self._open_cumsum[i1] - self._open_cumsum[i0])
+
+    def window_is_open(self, start, end):
+        """模型窗口 [start, end] 是否每天都开放"""
+        n_days = self._raw_offset(end) - self._raw_offset(start) + 1
+        return n_days > 0 and self.open_days_between(start, end) == n_days
+
+    def previous_open_day(self, date, attractions=None):
+        """
+        date 之前最近的开放日（不含当天），没有则返回 None
+        attractions 不为 None 时看所选景点自己的开放位图（任一开放即可）
+        """
+        i = min(self._raw_offset(date), len(self.day_open))
+        if i <= 0:
+            return None
+        if attractions is None:
+            j = self._last_open[i - 1]
+        else:
+            rows = self.attraction_rows(attractions)
+            j = self._attraction_last_open[rows, i - 1].max() if len(rows) else -1
+        return None if j < 0 else self.date_at(j)
+
+    def lag_open_day(self, date, k=1):
+        """date 之前第 k 个开放日，跳过闭园和缺失日期（特征滞后用）"""
+        i = min(max(self._raw_offset(date), 0), len(self.day_open))
+        rank = self._open_cumsum[i] - k
+        if k < 1 or rank < 0:
+            return None
+        return self.date_at(self._open_positions[rank])
+
+    def previous_open_period(self, date, freq, attractions=None):
+        """
+        date 所在周期之前、最近一个包含开放日的同类周期 (开始, 结束)
+        例如 2021-06 的上一个月会跳过整个闭园期，返回 2020-03
+        """
+        period_start, _ = period_bounds(date, freq)
+        prev_day = self.previous_open_day(period_start, attractions)
+        if prev_day is None:
+            return None
+        return period_bounds(prev_day, freq)
+
+    def missing_dates(self):
+        """既不开放、也不在已知闭园期的日期（数据缺失）"""
+        return self.start + pd.to_timedelta(np.flatnonzero(~self.day_open & ~self.day_closed), unit="D")
+
+    def closed_dates(self):
+        return self.start + pd.to_timedelta(np.flatnonzero(self.day_closed), unit="D")
+
+    # -----------------------------
+    # 按时刻查询（依赖 entity_schedule）
+    # -----------------------------
+    def open_at_mask(self, attraction, timestamps):
+        """
+        景点在一组时刻是否开放（向量化）
+        当天有开放时段记录的按时段判断，没有的退化为按天位图判断
+        """
+        t_ns = _to_ns(timestamps)
+        a = self.attraction_index.get(attraction)
+        if a is None:
+            return np.zeros(len(t_ns), dtype=bool)
+        idx = self.offsets(timestamps)
+        valid = idx >= 0
+        day = np.maximum(idx, 0)
+        hits = valid & self.attraction_open[a, day]
+        scheduled = valid & self._scheduled[a, day]
+        if scheduled.any():
+            hits[scheduled] = _interval_hits(self.intervals[attraction], t_ns[scheduled])
+        return hits & ~_interval_hits(self.closures.get(attraction, _EMPTY_INTERVALS), t_ns)
+
+    def is_open_at(self, attraction, timestamp):
+        return bool(self.open_at_mask(attraction, [timestamp])[0])
+
+
+def _build_intervals(codes, starts, ends, attractions):
+    """按景点分组，排序后 ends 取累计最大值（兼容重叠时段）"""
+    result = {}
+    if len(codes) == 0:
+        return result
+    order = np.lexsort((starts, codes))
+    codes, starts, ends = codes[order], starts[order], ends[order]
+    bounds = np.searchsorted(codes, np.arange(len(attractions) + 1))
+    for a, name in enumerate(attractions):
+        lo, hi = bounds[a], bounds[a + 1]
+        if hi > lo:
+            result[name] = (starts[lo:hi], np.maximum.accumulate(ends[lo:hi]))
+    return result
+
+
+def _mark_ranges(n_days, first, last):
+    """差分数组标记若干 [first, last] 下标区间，返回 bool 位图"""
+    first = np.clip(first, 0, n_days)
+    last = np.clip(last + 1, 0, n_days)
+    keep = last > first
+    diff = np.zeros(n_days + 1, dtype=np.int64)
+    np.add.at(diff, first[keep], 1)
+    np.add.at(diff, last[keep], -1)
+    return np.cumsum(diff[:-1]) > 0
+
+
+def build_operating_calendar(df, entity_schedule=None, closures=((CLOSED_START, CLOSED_END),),
+                             start=None, end=None, date_col="date", attraction_col="attraction"):
+    """
+    从数据（以及可选的 entity_schedule）构建运营日历
+    - df: 至少包含日期列和景点列，某景点某天有记录即视为当天开放
+    - entity_schedule: 清洗后的 entity_schedule，提供开放时段和临时关闭
+    - closures: 已知的全园闭园区间（闭区间）
+    """
+    dates = pd.to_datetime(df[date_col], errors="coerce").dt.normalize()
+    names = df[attraction_col]
+
+    es = entity_schedule if entity_schedule is not None and not entity_schedule.empty else None
+    if es is not None:
+        es_deb = pd.to_datetime(es["DEB_TIME"], errors="coerce")
+        es_fin = pd.to_datetime(es["FIN_TIME"], errors="coerce")
+        es_day = pd.to_datetime(es["WORK_DATE"], errors="coerce").dt.normalize() if "WORK_DATE" in es.columns \
+            else es_deb.dt.normalize()
+        es_label = es["REF_CLOSING_DESCRIPTION"].fillna(OPEN_LABEL)
+        es_park = es["ENTITY_TYPE"].eq("PARK") if "ENTITY_TYPE" in es.columns else pd.Series(False, index=es.index)
+        es_names = es["ENTITY_DESCRIPTION_SHORT"]
+
+    start = pd.Timestamp(start).normalize() if start is not None else dates.min()
+    end = pd.Timestamp(end).normalize() if end is not None else dates.max()
+    n_days = (end - start).days + 1
+
+    all_names = names.dropna()
+    if es is not None:
+        all_names = pd.concat([all_names, es_names[~es_park].dropna()])
+    attractions = sorted(all_names.astype(str).unique())
+
+    def day_index(values):
+        return ((values - start) // ONE_DAY).fillna(-1).astype(np.int64).to_numpy()
+
+    def attraction_codes(values):
+        return pd.Categorical(values.astype(str), categories=attractions).codes.astype(np.int64)
+
+    # 1) 数据中出现过的 (景点, 日期) 视为开放
+    attraction_open = np.zeros((len(attractions), n_days), dtype=bool)
+    d = day_index(dates)
+    a = attraction_codes(names)
+    ok = names.notna().to_numpy() & (a >= 0) & (d >= 0) & (d < n_days)
+    attraction_open[a[ok], d[ok]] = True
+
+    # 2) 已知闭园区间
+    if closures:
+        first = np.array([(pd.Timestamp(s) - start).days for s, _ in closures], dtype=np.int64)
+        last = np.array([(pd.Timestamp(e) - start).days for _, e in closures], dtype=np.int64)
+        day_closed = _mark_ranges(n_days, first, last)
+    else:
+        day_closed = np.zeros(n_days, dtype=bool)
+
+    intervals, closure_intervals = {}, {}
+    if es is not None:
+        timed = es_deb.notna() & es_fin.notna()
+        is_open_row = (es_label == OPEN_LABEL) & ~es_park & timed
+        is_closing_row = (es_label != OPEN_LABEL) & timed
+
+        # 3) 开放时段：标记开放日 + 记录时段
+        d = day_index(es_day[is_open_row])
+        a = attraction_codes(es_names[is_open_row])
+        ok = (a >= 0) & (d >= 0) & (d < n_days)
+        attraction_open[a[ok], d[ok]] = True
+        intervals = _build_intervals(a[ok], _to_ns(es_deb[is_open_row])[ok], _to_ns(es_fin[is_open_row])[ok],
+                                     attractions)
+
+        # 4) 全园关闭：完整覆盖的日期记为闭园日
+        park_rows = is_closing_row & es_park
+        if park_rows.any():
+            first = day_index(es_deb[park_rows].dt.ceil("D"))
+            last = day_index((es_fin[park_rows] + pd.Timedelta(nanoseconds=1)).dt.floor("D")) - 1
+            day_closed |= _mark_ranges(n_days, first, last)
+
+        # 5) 景点临时关闭：保留为时段，按时刻查询时扣除
+        attr_rows = is_closing_row & ~es_park
+        a = attraction_codes(es_names[attr_rows])
+        ok = a >= 0
+        closure_intervals = _build_intervals(a[ok], _to_ns(es_deb[attr_rows])[ok], _to_ns(es_fin[attr_rows])[ok],
+                                             attractions)
+
+    attraction_open &= ~day_closed
+    day_open = attraction_open.any(axis=0)
+
+    return OperatingCalendar(start, day_open, day_closed, attractions, attraction_open,
+                             intervals=intervals, closures=closure_intervals)
@@ -0,0 +1,92 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+from data.aggregate_store import build_aggregate_store
+from data.join_service import build_show_index, build_weather_index
+from data.loader import read_entity_schedule, read_fake_data, read_historical_data, read_show_schedule, read_weather_data
+from data.operating_calendar import build_operating_calendar
+
+try:
+    import streamlit as st
+except ImportError:  # API / 批处理脚本不需要 Streamlit
+    st = None
+
+# -----------------------------
+# 共享数据层
+#   历史 + 7 天假数据 + entity_schedule -> 明细 / 运营日历 / 预聚合存储
+#   所有页面共用同一份（Streamlit 下进程内只构建一次），API 和批处理脚本也从这里构建
+# -----------------------------
+
+
+def build_shared_state():
+    """
+    返回 dict:
+      rows      : 历史 + 假数据明细，按日期排序
+      row_dates : rows 的日期数组（切片用）
+      calendar  : 运营日历
+      store     : 预聚合存储
+    """
+    df_all = pd.concat([read_historical_data(), read_fake_data()], ignore_index=True)
+    df_all = df_all.sort_values("date", kind="stable").reset_index(drop=True)
+    return {
+        "rows": df_all,
+        "row_dates": df_all["date"].to_numpy(),
+        "calendar": build_operating_calendar(df_all[["date", "attraction"]], entity_schedule=read_entity_schedule()),
+        "store": build_aggregate_store(df_all),
+    }
+
+
+def build_join_indexes():
+    """
+    天气 / 表演时间索引，来自清洗后的天气表和表演时间表；文件不存在时为 None（预测不加对应特征）
+    合并明细里只有 *_FLAG 列，没有表演时间，不能用来建表演索引
+    """
+    weather_df = read_weather_data()
+    weather = build_weather_index(weather_df) if weather_df is not None else None
+
+    show_df = read_show_schedule()
+    shows = build_show_index(show_df) if show_df is not None else None
+    return weather, shows
+
+
+if st is not None:
+    load_shared_state = st.cache_resource(build_shared_state)
+    load_join_indexes = st.cache_resource(build_join_indexes)
+else:
+    load_shared_state = functools.lru_cache(maxsize=1)(build_shared_state)
+    load_join_indexes = functools.lru_cache(maxsize=1)(build_join_indexes)
+
+
+def load_operating_calendar():
+    """运营日历（所有页面共用）"""
+    return load_shared_state()["calendar"]
+
+
+def load_aggregate_store():
+    """预聚合存储（所有页面共用）"""
+    return load_shared_state()["store"]
+
+
+def load_rows():
+    """历史 + 假数据明细（所有页面共用同一份，和 delta 用的预聚合存储同源）"""
+    return load_shared_state()["rows"]
+
+
+def slice_rows(state, start, end=None):
+    """
+    明细的 [start, end] 闭区间（按天）切片，end 默认同 start
+    明细按日期排好序，用 searchsorted 取连续切片，不做全表过滤
+    """
+    dates = state["row_dates"]
+    start = pd.Timestamp(start).normalize()
+    end = start if end is None else pd.Timestamp(end).normalize()
+    lo = np.searchsorted(dates, np.datetime64(start).astype(dates.dtype), side="left")
+    hi = np.searchsorted(dates, np.datetime64(end).astype(dates.dtype), side="right")
+    return state["rows"].iloc[lo:hi]
+
+
+def rows_between(start, end=None):
+    """页面用：共享明细的 [start, end] 切片"""
+    return slice_rows(load_shared_state(), start, end)
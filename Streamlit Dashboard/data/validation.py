@@ -0,0 +1,272 @@
+"""
+数据校验 & 修复引擎（声明式规则）
+规则按顺序执行，每条规则都是整列向量化 / 窗口化的计算；
+批次先按时间排序，可带上上一批清洗结果的尾部作为上下文（ffill / 邻近均值跨批次衔接），
+违规行（修复前的原始值）写入隔离文件，修复不了的行从清洗结果中去掉，并输出每条规则的计数
+
+运行:
+    python -m data.validation waiting_times.csv --kind waiting_times --out-dir cleaned_data
+    python -m data.validation attendance.csv --kind attendance --out-dir cleaned_data \
+        --carry-in cleaned_data/attendance_prev_cleaned.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# 规则集（对应各清洗 notebook 的处理步骤）
+#   rule      : range / non_negative / sum_equals
+#   on_fail   : repair（修复后保留）/ flag（保留原值，仅隔离）/ drop（从清洗结果中去掉）
+#   repair    : clip / ffill / neighbour_mean / zero
+# -----------------------------
+WAITING_TIMES_RULES = [
+    {"name": "negative_units_guests", "rule": "non_negative", "columns": ["NB_UNITS", "GUEST_CARRIED"],
+     "on_fail": "repair", "repair": "ffill", "group_by": "ENTITY_DESCRIPTION_SHORT"},
+    {"name": "negative_other", "rule": "non_negative",
+     "columns": ["WAIT_TIME_MAX", "CAPACITY", "ADJUST_CAPACITY", "NB_MAX_UNIT"], "on_fail": "flag"},
+    {"name": "up_time_range", "rule": "range", "columns": ["UP_TIME"], "min": 0, "max": 15,
+     "on_fail": "repair", "repair": "clip"},
+    {"name": "time_cap_15", "rule": "range", "columns": ["OPEN_TIME", "DOWNTIME"], "max": 15,
+     "on_fail": "repair", "repair": "clip"},
+    {"name": "up_plus_down_15", "rule": "sum_equals", "columns": ["UP_TIME", "DOWNTIME"], "total": 15,
+     "on_fail": "flag"},
+]
+
+ATTENDANCE_RULES = [
+    {"name": "negative_attendance", "rule": "non_negative", "columns": ["attendance"],
+     "on_fail": "repair", "repair": "neighbour_mean", "window": 3, "group_by": "FACILITY_NAME"},
+]
+
+RULE_SETS = {
+    "waiting_times": WAITING_TIMES_RULES,
+    "attendance": ATTENDANCE_RULES,
+}
+
+# 各批次的时间列：修复前按它排序，ffill / 邻近均值按时间顺序而不是文件顺序
+TIME_COLUMNS = {
+    "waiting_times": "DEB_TIME",
+    "attendance": "USAGE_DATE",
+}
+
+
+# -----------------------------
+# 修复 kernel（整列向量化）
+# -----------------------------
+def _group_codes(df, group_by):
+    if group_by is None or group_by not in df.columns:
+        return None
+    return pd.Categorical(df[group_by]).codes
+
+
+def neighbour_mean(values, invalid, window=3, groups=None):
+    """
+    同 notebook：按顺序逐个修复无效值，用之前 window 个有效值（包括前面已修复的值）
+    和之后 window 个原始有效值的均值替换；前后都没有有效值时保持原值
+    只对无效值循环，每个 O(window + log n)，有效值的位置用 searchsorted 查找
+    """
+    values = np.asarray(values, dtype=np.float64)
+    invalid = np.asarray(invalid, dtype=bool)
+    n = len(values)
+    if groups is None:
+        groups = np.zeros(n, dtype=np.int8)
+    groups = np.asarray(groups)
+
+    # 按组稳定排序（组内保持原顺序，调用前已按时间排好）
+    order = np.argsort(groups, kind="stable")
+    v, bad, g = values[order].copy(), invalid[order], groups[order]
+    good = ~bad & np.isfinite(v)
+    good_pos = np.flatnonzero(good)
+
+    change = np.flatnonzero(np.diff(g)) + 1
+    starts = np.concatenate([[0], change])
+    ends = np.concatenate([change, [n]])
+    for lo, hi in zip(starts, ends):
+        tail = []  # 当前位置之前最近的 window 个有效值（含已修复）
+        last = lo
+        for p in np.flatnonzero(bad[lo:hi]) + lo:
+            between = v[last:p][good[last:p]]
+            tail = (tail + between[-window:].tolist())[-window:]
+            k = np.searchsorted(good_pos, p, side="right")
+            after = good_pos[k:k + window]
+            after = v[after[after < hi]]
+            neighbours = tail + after.tolist()
+            if neighbours:
+                v[p] = np.mean(neighbours)
+                tail = (tail + [v[p]])[-window:]
+            last = p + 1
+
+    out = np.empty_like(v)
+    out[order] = v
+    return out
+
+
+def _repair(df, col, invalid, rule):
+    method = rule.get("repair")
+    groups = _group_codes(df, rule.get("group_by"))
+    if method == "clip":
+        return df[col].clip(lower=rule.get("min"), upper=rule.get("max"))
+    if method == "zero":
+        return df[col].mask(invalid, 0)
+    if method == "ffill":
+        masked = df[col].mask(invalid)
+        if groups is None:
+            return masked.ffill()
+        return masked.groupby(groups).ffill()
+    if method == "neighbour_mean":
+        return pd.Series(neighbour_mean(df[col], invalid, rule.get("window", 3), groups), index=df.index)
+    raise ValueError(f"Unknown repair method: {method}")
+
+
+# -----------------------------
+# 规则 kernel：返回违规 mask
+# -----------------------------
+def _check(df, rule):
+    """返回 {列名: 违规 mask}"""
+    kind = rule["rule"]
+    columns = [c for c in rule["columns"] if c in df.columns]
+    if kind == "range":
+        lower, upper = rule.get("min"), rule.get("max")
+        result = {}
+        for col in columns:
+            bad = pd.Series(False, index=df.index)
+            if lower is not None:
+                bad |= df[col] < lower
+            if upper is not None:
+                bad |= df[col] > upper
+            result[col] = bad
+        return result
+    if kind == "non_negative":
+        return {col: df[col] < 0 for col in columns}
+    if kind == "sum_equals":
+        if len(columns) < len(rule["columns"]):
+            return {}
+        total = df[columns].sum(axis=1)
+        return {"+".join(columns): pd.Series(~np.isclose(total, rule["total"]), index=df.index)}
+    raise ValueError(f"Unknown rule: {kind}")
+
+
+def _time_order(df, time_col):
+    """按时间稳定排序后的行位置（时间解析失败的行排在最后）"""
+    if time_col is None or time_col not in df.columns:
+        return np.arange(len(df))
+    t = pd.to_datetime(df[time_col], errors="coerce")
+    return np.lexsort((np.arange(len(df)), t.isna().to_numpy(), t.to_numpy()))
+
+
+def carry_in_tail(clean_df, rules, time_col=None):
+    """
+    上一批清洗结果的尾部：每条修复规则的每个分组取最后 window 行（ffill 取 1 行）
+    作为下一批的上下文
+    """
+    if clean_df is None or clean_df.empty:
+        return None
+    df = clean_df.iloc[_time_order(clean_df, time_col)]
+    keep = pd.Series(False, index=df.index)
+    for rule in rules:
+        if rule.get("on_fail") != "repair" or rule.get("repair") not in ("ffill", "neighbour_mean"):
+            continue
+        n = rule.get("window", 3) if rule["repair"] == "neighbour_mean" else 1
+        group_by = rule.get("group_by")
+        if group_by in df.columns:
+            keep |= df.groupby(group_by, sort=False).cumcount(ascending=False) < n
+        else:
+            keep.iloc[-n:] = True
+    return df[keep] if keep.any() else None
+
+
+def validate(df, rules, time_col=None, carry_in=None):
+    """
+    按顺序执行规则
+    time_col: 修复前按该列排序（组内按时间 ffill / 取邻近值），输出仍保持输入顺序
+    carry_in: 上一批的尾部（carry_in_tail），只作为修复的上下文，不出现在任何输出和计数里
+    返回 (clean_df, quarantine_df, report_df)
+    - clean_df      : 修复后的数据（on_fail=drop 的违规行和修复不了的行已去掉）
+    - quarantine_df : 所有违规行的原始值 + violations 列（违反的规则名）
+    - report_df     : 每条规则 / 每列的违规数、修复数和去掉的行数
+    """
+    original = df
+    n_context = 0 if carry_in is None else len(carry_in)
+    combined = df if not n_context else pd.concat([carry_in, df], ignore_index=True)
+    combined = combined.reset_index(drop=True)
+    order = _time_order(combined, time_col)
+    work = combined.iloc[order].copy()
+    context = pd.Series(order < n_context, index=work.index)
+
+    violations = pd.Series("", index=work.index)
+    drop = pd.Series(False, index=work.index)
+    report = []
+
+    for rule in rules:
+        name = rule.get("name", rule["rule"])
+        on_fail = rule.get("on_fail", "flag")
+        for col, bad in _check(work, rule).items():
+            bad = bad.fillna(False).astype(bool) & ~context
+            n_bad = int(bad.sum())
+            repaired = dropped = 0
+            if n_bad:
+                violations = violations.where(~bad, violations + np.where(violations == "", "", ";") + name)
+                if on_fail == "repair" and col in work.columns:
+                    work[col] = _repair(work, col, bad, rule)
+                    still_bad = _check(work, {**rule, "columns": [col]})[col].fillna(False)
+                    unrepaired = bad & (still_bad | work[col].isna())
+                    repaired = n_bad - int(unrepaired.sum())
+                    # 修复不了的行（例如前后都没有有效值）不进清洗结果，原始值已在隔离文件里
+                    dropped = int((unrepaired & ~drop).sum())
+                    drop |= unrepaired
+                elif on_fail == "drop":
+                    dropped = int((bad & ~drop).sum())
+                    drop |= bad
+            report.append({"rule": name, "column": col, "violations": n_bad, "repaired": repaired,
+                           "dropped": dropped, "action": on_fail})
+
+    # 去掉上下文行，恢复输入顺序和索引
+    keep = ~context
+    work, violations, drop = work[keep], violations[keep], drop[keep]
+    position = order[keep.to_numpy()] - n_context
+    restore = np.argsort(position, kind="stable")
+    work, violations, drop = work.iloc[restore], violations.iloc[restore], drop.iloc[restore]
+    work.index = violations.index = drop.index = original.index
+
+    flagged = (violations != "").to_numpy()
+    quarantine = original[flagged].copy()
+    quarantine["violations"] = violations[flagged].to_numpy()
+    return work[~drop.to_numpy()], quarantine, pd.DataFrame(report)
+
+
+def run_batch(path, kind, out_dir, carry_in_path=None):
+    """
+    校验一个批次文件，输出 清洗结果 / 隔离文件 / 报告
+    carry_in_path: 上一批的清洗结果，取其尾部作为修复上下文
+    """
+    rules, time_col = RULE_SETS[kind], TIME_COLUMNS.get(kind)
+    df = pd.read_csv(path, low_memory=False)
+    carry_in = None
+    if carry_in_path:
+        carry_in = carry_in_tail(pd.read_csv(carry_in_path, low_memory=False), rules, time_col)
+    clean, quarantine, report = validate(df, rules, time_col, carry_in)
+
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    clean.to_csv(os.path.join(out_dir, f"{stem}_cleaned.csv"), index=False)
+    quarantine.to_csv(os.path.join(out_dir, f"{stem}_quarantine.csv"), index=False)
+    report.to_csv(os.path.join(out_dir, f"{stem}_validation_report.csv"), index=False)
+    return clean, quarantine, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate and repair a daily data batch")
+    parser.add_argument("path")
+    parser.add_argument("--kind", choices=sorted(RULE_SETS), required=True)
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--carry-in", help="previous batch's cleaned file, used as repair context")
+    args = parser.parse_args()
+
+    _, quarantine, report = run_batch(args.path, args.kind, args.out_dir, args.carry_in)
+    print(report.to_string(index=False))
+    print(f"🚧 {len(quarantine)} rows quarantined")
+
+
+if __name__ == "__main__":
+    main()
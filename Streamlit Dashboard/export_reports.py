@@ -0,0 +1,231 @@
+"""
+批量导出静态报告（不需要打开 Streamlit 逐个点选）
+每个 景点 × 周期 输出 KPI + 趋势图：HTML（必有）、PNG（需要 kaleido）、KPI 表 Parquet（需要 pyarrow，否则 CSV）
+数据只加载一次，构建预聚合存储后分发给进程池，每个进程负责若干景点的所有周期
+plotly.js 只在输出目录根部写一份，HTML 用相对路径引用，离线也能打开
+
+运行:
+    python export_reports.py                          # 所有景点的周报
+    python export_reports.py --freq M --start 2022-01-01 --workers 8
+    python export_reports.py --attractions "Roller Coaster,Zipline" --out-dir reports
+"""
+import argparse
+import html
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from plotly.offline import get_plotlyjs
+
+from data.aggregate_store import KPIS, AggregateStore
+from data.comparison import BASELINES, compare, delta_map
+from data.operating_calendar import period_bounds
+from data.shared import build_shared_state
+
+try:
+    import kaleido  # noqa: F401  plotly 导出 PNG 需要
+except ImportError:
+    kaleido = None
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+FREQ_LABELS = {"W": "Weekly", "M": "Monthly", "Y": "Yearly"}
+KPI_LABELS = {
+    "attendance": "📊 Total Attendance",
+    "avg_wait": "🛎️ Avg Wait Time (min)",
+    "peak_wait": "📈 Peak Wait Time (min)",
+    "capacity_utilization": "🎢 Capacity Utilization (%)",
+}
+
+PLOTLY_JS = "plotly.min.js"  # 输出目录根部，报告在 <out_dir>/<freq>/<景点>/ 下
+
+# 子进程里共享的只读数据（initializer 里加载一次）
+_WORKER = {}
+
+
+def period_windows(start, end, freq):
+    """[start, end] 覆盖到的所有自然周期 [(开始, 结束), ...]"""
+    windows = []
+    period_start, period_end = period_bounds(start, freq)
+    while period_start <= end:
+        windows.append((period_start, period_end))
+        period_start, period_end = period_bounds(period_end + pd.Timedelta(days=1), freq)
+    return windows
+
+
+def period_label(start, freq):
+    if freq == "W":
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    if freq == "M":
+        return start.strftime("%Y-%m")
+    return start.strftime("%Y")
+
+
+def _slug(name):
+    return re.sub(r"[^0-9A-Za-z]+", "_", str(name)).strip("_") or "attraction"
+
+
+# -----------------------------
+# 子进程
+# -----------------------------
+def _init_worker(store_path, calendar):
+    _WORKER["store"] = AggregateStore.load(store_path)
+    _WORKER["calendar"] = calendar
+
+
+def _daily_trend(store, row, start, end):
+    """从预聚合存储直接取每日平均等待时间（不回到 15 分钟明细）"""
+    i0, i1 = max(store.offset(start), 0), min(store.offset(end) + 1, store.n_days)
+    days = pd.date_range(store.start + pd.Timedelta(days=i0), periods=max(i1 - i0, 0), freq="D")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg = store.wait_sum[row, i0:i1] / store.wait_count[row, i0:i1]
+    return pd.DataFrame({"date": days, "wait_time_max": avg}).dropna()
+
+
+def _render_html(attraction, label, freq, kpi_row, fig):
+    name = html.escape(str(attraction))
+    cards = ""
+    for kpi in KPIS:
+        delta = kpi_row[f"{kpi}_delta_pct"]
+        delta_str = "" if delta is None else f"{delta:+}%"
+        cards += f"<div class='kpi'><div>{KPI_LABELS[kpi]}</div><b>{kpi_row[kpi]}</b><small>{delta_str}</small></div>"
+    return (
+        "<html><head><meta charset='utf-8'>"
+        f"<title>{name} - {FREQ_LABELS[freq]} Report {label}</title>"
+        f"<script src='../../{PLOTLY_JS}'></script>"
+        "<style>body{font-family:sans-serif;margin:2em}.kpi{display:inline-block;margin-right:2em}"
+        ".kpi b{display:block;font-size:1.6em}</style></head><body>"
+        f"<h1>🎢 {name} - {FREQ_LABELS[freq]} Report {label}</h1>"
+        f"<p>{kpi_row['start']:%Y-%m-%d} ~ {kpi_row['end']:%Y-%m-%d} | vs {BASELINES[kpi_row['baseline']]}"
+        " (attendance change is per open day)</p>"
+        f"<div>{cards}</div>"
+        f"{fig.to_html(full_html=False, include_plotlyjs=False)}"
+        "</body></html>"
+    )
+
+
+def export_attraction(attraction, windows, freq, baseline, out_dir, png=True):
+    """单个景点所有周期：KPI（一次向量化查询）+ 对比 + 每个周期一份 HTML / PNG"""
+    store, calendar = _WORKER["store"], _WORKER["calendar"]
+    row = store.attraction_index[attraction]
+    starts, ends = [w[0] for w in windows], [w[1] for w in windows]
+    values = store.window_kpis(starts, ends, [attraction])
+
+    folder = os.path.join(out_dir, FREQ_LABELS[freq].lower(), _slug(attraction))
+    os.makedirs(folder, exist_ok=True)
+
+    records = []
+    for j, (start, end) in enumerate(windows):
+        if not np.isfinite(values["avg_wait"][j]):
+            continue  # 该周期没有数据（闭园 / 景点未开放）
+        label = period_label(start, freq)
+        deltas = delta_map(compare(store, start, end, [attraction], baselines=(baseline,),
+                                   calendar=calendar, freq=freq), baseline)
+        record = {"attraction": attraction, "period": label, "start": start, "end": end, "baseline": baseline}
+        for kpi in KPIS:
+            record[kpi] = round(float(values[kpi][j]), 2)
+            record[f"{kpi}_delta_pct"] = deltas.get(kpi)
+        records.append(record)
+
+        trend_df = _daily_trend(store, row, start, end)
+        fig = px.line(trend_df, x="date", y="wait_time_max",
+                      title=f"{attraction} - Daily Avg Wait Time ({label})",
+                      labels={"wait_time_max": "Daily Average Waiting Time"})
+        path = os.path.join(folder, label)
+        with open(f"{path}.html", "w", encoding="utf-8") as f:
+            f.write(_render_html(attraction, label, freq, record, fig))
+        if png and kaleido is not None:
+            fig.write_image(f"{path}.png")
+
+    return records
+
+
+def _export_many(attractions, windows, freq, baseline, out_dir, png):
+    records = []
+    for attraction in attractions:
+        records.extend(export_attraction(attraction, windows, freq, baseline, out_dir, png))
+    return records
+
+
+# -----------------------------
+# 主流程
+# -----------------------------
+def write_table(df, path):
+    """有 pyarrow 写 Parquet，否则写 CSV；返回实际路径"""
+    if pyarrow is not None:
+        df.to_parquet(f"{path}.parquet", index=False)
+        return f"{path}.parquet"
+    df.to_csv(f"{path}.csv", index=False)
+    return f"{path}.csv"
+
+
+def export_reports(freq="W", start=None, end=None, attractions=None, baseline="previous",
+                   out_dir="reports", workers=None, png=True):
+    """
+    导出所有 景点 × 周期 的报告，返回汇总 KPI 表
+    """
+    state = build_shared_state()
+    store, calendar = state["store"], state["calendar"]
+    del state
+
+    start = pd.Timestamp(start).normalize() if start else store.start
+    end = pd.Timestamp(end).normalize() if end else store.end
+    windows = period_windows(start, end, freq)
+    attractions = [a for a in (attractions or store.attractions) if a in store.attraction_index]
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, PLOTLY_JS), "w", encoding="utf-8") as f:
+        f.write(get_plotlyjs())
+
+    # 存储写成 npz，子进程各自读一次，不按任务重复序列化
+    workers = workers or os.cpu_count() or 1
+    chunks = [attractions[i::workers] for i in range(workers) if attractions[i::workers]]
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, "store.npz")
+        store.save(store_path)
+        with ProcessPoolExecutor(max_workers=len(chunks) or 1, initializer=_init_worker,
+                                 initargs=(store_path, calendar)) as pool:
+            futures = [pool.submit(_export_many, chunk, windows, freq, baseline, out_dir, png) for chunk in chunks]
+            records = [record for future in futures for record in future.result()]
+
+    summary = pd.DataFrame(records)
+    if not summary.empty:
+        summary = summary.sort_values(["attraction", "start"], ignore_index=True)
+        write_table(summary, os.path.join(out_dir, f"{FREQ_LABELS[freq].lower()}_kpis"))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export static KPI reports for every attraction and period")
+    parser.add_argument("--freq", choices=sorted(FREQ_LABELS), default="W")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--attractions", help="comma separated, default: all")
+    parser.add_argument("--baseline", choices=list(BASELINES), default="previous")
+    parser.add_argument("--out-dir", default="reports")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-png", action="store_true")
+    args = parser.parse_args()
+
+    attractions = [a.strip() for a in args.attractions.split(",")] if args.attractions else None
+    t0 = time.perf_counter()
+    summary = export_reports(args.freq, args.start, args.end, attractions, args.baseline,
+                             args.out_dir, args.workers, png=not args.no_png)
+    n_attractions = summary["attraction"].nunique() if not summary.empty else 0
+    print(f"✅ {len(summary)} reports for {n_attractions} attractions -> {args.out_dir} "
+          f"({time.perf_counter() - t0:.1f}s)")
+    if kaleido is None and not args.no_png:
+        print("ℹ️ kaleido not installed, PNG export skipped")
+
+
+if __name__ == "__main__":
+    main()
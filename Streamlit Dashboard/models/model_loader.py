@@ -1,33 +1,92 @@
-# ---------------------------- 新增预测数据加载函数 ----------------------------
+# ---------------------------- 预测模型加载函数 ----------------------------
+import json
+import os
+
 import pandas as pd
 import numpy as np
 
-def load_forecast_data(date_selected, attraction_list):
-    """生成模拟预测数据（未来需替换为真实模型预测）"""
-    np.random.seed(42)
-    
-    # 生成未来日期范围（示例：预测未来24小时，间隔15分钟）
-    date_range = pd.date_range(
-        start=date_selected,
-        end=date_selected + pd.Timedelta(days=1),
-        freq="15min"
-    )
-    
-    # 构建模拟预测数据框架
-    forecast_data = []
-    for attraction in attraction_list:
-        for ts in date_range:
-            forecast_data.append({
-                "date": ts,
-                "attraction": attraction,
-                "wait_time_max": np.random.randint(10, 120),  # 模拟等待时间
-                "attendance": np.random.randint(50, 500),     # 模拟客流量
-                "capacity_utilization": np.random.uniform(60, 100),  # 模拟容量利用率
-                "hour": ts.hour,
-                "time_slot": ts.strftime("%H:%M")
-            })
-    
-    return pd.DataFrame(forecast_data)
+try:
+    import xgboost as xgb
+except ImportError:  # 没装 xgboost 时日内回放退回 典型等待 + 残差
+    xgb = None
+
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+INTRADAY_MODEL_PATH = os.path.join(MODELS_DIR, "XGBoost_intraday.json")
+# models.tuning 调好的等待时间模型（特征列表记在指标文件里）
+WAIT_MODEL_PATH = os.path.join(MODELS_DIR, "XGBoost_tuned.json")
+WAIT_METRICS_PATH = os.path.join(MODELS_DIR, "XGBoost_tuned_metrics.json")
+# 训练特征名 -> 明细列名（data.loader 读数时重命名过的列）
+ROW_COLUMNS = {"DEB_TIME_HOUR": "hour"}
+
+
+class BoosterModel:
+    """xgboost Booster 包一层 predict(ndarray)，直接在 numpy 矩阵上预测（不建 DMatrix）"""
+
+    def __init__(self, booster, features=None):
+        self.booster = booster
+        self.features = features
+
+    def predict(self, X):
+        return self.booster.inplace_predict(X)
+
+
+def load_intraday_model(path=INTRADAY_MODEL_PATH):
+    """加载日内多步预测模型（models.tuning --intraday 训练），没有模型或没装 xgboost 时返回 None"""
+    if xgb is None or not os.path.exists(path):
+        return None
+    booster = xgb.Booster()
+    booster.load_model(path)
+    return BoosterModel(booster)
+
+def load_wait_model(path=WAIT_MODEL_PATH, metrics_path=WAIT_METRICS_PATH):
+    """加载调好的等待时间模型（models.tuning 训练），没有模型或没装 xgboost 时返回 None"""
+    if xgb is None or not os.path.exists(path) or not os.path.exists(metrics_path):
+        return None
+    with open(metrics_path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    booster = xgb.Booster()
+    booster.load_model(path)
+    return BoosterModel(booster, features)
+
+
+def row_times(rows):
+    """明细每行的时刻：有 DEB_TIME 用 DEB_TIME，否则 日期 + 小时（假数据是 1 小时粒度）"""
+    times = rows["date"] + pd.to_timedelta(pd.to_numeric(rows["hour"], errors="coerce").fillna(0), unit="h")
+    if "DEB_TIME" in rows.columns:
+        times = pd.to_datetime(rows["DEB_TIME"], errors="coerce").fillna(times)
+    return times
+
+
+def forecast_wait_times(rows, model, weather=None, shows=None):
+    """
+    调好的模型在明细上的等待时间预测（不再使用随机模拟数据）
+    rows: 共享明细切片（历史或假数据），每行一个 (景点, 时刻)
+    明细里没有的特征列先从天气 / 表演索引 join，仍然没有的当缺失值（xgboost 原生处理）
+    返回 date（时刻）/ attraction / hour / time_slot / wait_time_max（预测值，分钟）
+    """
+    times = row_times(rows).reset_index(drop=True)
+    columns = {feature: ROW_COLUMNS.get(feature, feature) for feature in model.features}
+    missing = [feature for feature, col in columns.items() if col not in rows.columns]
+    joined = None
+    if missing and (weather is not None or shows is not None):
+        from data.join_service import add_event_features
+        joined = add_event_features(pd.DataFrame({"DEB_TIME": times}), weather, shows)
+
+    X = np.full((len(rows), len(model.features)), np.nan, dtype=np.float32)
+    for j, feature in enumerate(model.features):
+        if feature not in missing:
+            X[:, j] = pd.to_numeric(rows[columns[feature]], errors="coerce").to_numpy(dtype=np.float32)
+        elif joined is not None and feature in joined.columns:
+            X[:, j] = pd.to_numeric(joined[feature], errors="coerce").to_numpy(dtype=np.float32)
+
+    return pd.DataFrame({
+        "date": times,
+        "attraction": rows["attraction"].to_numpy(),
+        "hour": times.dt.hour,
+        "time_slot": times.dt.strftime("%H:%M"),
+        "wait_time_max": np.clip(model.predict(X), 0, None),
+    })
 
 # 更新 __all__ 以导出新函数
-__all__ = ["load_forecast_data"]
\ No newline at end of file
+__all__ = ["load_intraday_model", "load_wait_model", "forecast_wait_times", "row_times",
+           "INTRADAY_MODEL_PATH", "WAIT_MODEL_PATH"]
\ No newline at end of file
@@ -0,0 +1,353 @@
+"""
+XGBoost 等待时间模型调参
+- 特征只构建一次：读 CSV -> float32 矩阵，按源文件缓存到 models/.cache（源文件没变就直接读缓存）
+- 每个时间序列 fold 只建一次 QuantileDMatrix（分箱 / 量化），所有试验共用
+- 连续减半 (successive halving) + early stopping，多个试验在线程池里并行（xgboost 训练释放 GIL）
+- 最后 HOLDOUT_OPEN_DAYS 个开放日留作测试集，不参与任何 fold（early stopping / 选参都看不到），
+  最优参数在测试集之前的全部数据上重训后只在测试集上评估一次
+- 最优模型和指标写到 models/XGBoost_tuned.json / XGBoost_tuned_metrics.json
+- --intraday：训练日内回放用的多步预测模型（滞后特征来自 services.replay）-> models/XGBoost_intraday.json
+
+运行:
+    python -m models.tuning --trials 27 --folds 3 --workers 4
+    python -m models.tuning --intraday --start 2022-01-01 --end 2022-05-31
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from data.join_service import SHOW_EVENTS, build_show_index
+from data.loader import HISTORICAL_DATA_PATH, SHOW_SCHEDULE_PATH, read_historical_data, read_show_schedule
+from data.operating_calendar import ONE_DAY, build_operating_calendar
+from models.model_loader import INTRADAY_MODEL_PATH, WAIT_METRICS_PATH, WAIT_MODEL_PATH
+
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(MODELS_DIR, ".cache")
+MODEL_PATH = WAIT_MODEL_PATH
+METRICS_PATH = WAIT_METRICS_PATH
+
+# 与 XGBoost.ipynb 相同的特征和目标
+FEATURES = ['attendance', 'DEB_TIME_HOUR', 'NB_UNITS',
+            'GUEST_CARRIED', 'CAPACITY', 'ADJUST_CAPACITY', 'OPEN_TIME', 'UP_TIME',
+            'DOWNTIME', 'NB_MAX_UNIT', 'dew_point', 'feels_like',
+            'humidity', 'wind_speed', 'rain_1h', 'snow_1h']
+TARGET = "WAIT_TIME_MAX"
+TIME_COL = "DEB_TIME"
+# 可选：表演时间特征（合并数据里只有 *_FLAG 列，时间来自清洗后的表演时间表，按 DEB_TIME 时间戳 join）
+EVENT_FEATURES = [f"{prefix}_{event}" for event in SHOW_EVENTS for prefix in ("TIME_TO", "NEAR")]
+
+# notebook 里手选的参数作为基准，也作为搜索的第一个候选
+BASE_PARAMS = {
+    "objective": "reg:squarederror",
+    "eval_metric": "mae",
+    "tree_method": "hist",
+    "max_bin": 256,
+    "eta": 0.05,
+    "max_depth": 9,
+    "subsample": 0.9,
+    "colsample_bytree": 1.0,
+    "gamma": 0.1,
+    "seed": 42,
+}
+
+SEARCH_SPACE = {
+    "eta": [0.03, 0.05, 0.1, 0.2],
+    "max_depth": [4, 6, 8, 9, 10, 12],
+    "subsample": [0.6, 0.8, 0.9, 1.0],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "min_child_weight": [1, 5, 10, 20],
+    "gamma": [0.0, 0.1, 0.5, 1.0],
+    "lambda": [0.5, 1.0, 5.0],
+}
+
+MIN_ROUNDS = 50      # 第一轮每个试验的树数
+MAX_ROUNDS = 1350    # 最后一轮的树数上限
+HALVING_RATE = 3     # 每轮保留 1/3，树数 ×3
+EARLY_STOPPING = 30
+VALID_OPEN_DAYS = 14  # 每个验证窗口的连续开放天数
+HOLDOUT_OPEN_DAYS = 28  # 最终测试集：数据最后 28 个开放日
+INTRADAY_ROUNDS = 500  # 日内模型树数上限（early stopping）
+
+
+# -----------------------------
+# 特征矩阵（带磁盘缓存）
+# -----------------------------
+def _file_key(path):
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}_{stat.st_size}_{int(stat.st_mtime)}"
+
+
+def _cache_path(path, event_features=False):
+    key = _file_key(path)
+    if event_features:
+        key += f"_events_{_file_key(SHOW_SCHEDULE_PATH)}"  # 表演时间表变了也要重建
+    return os.path.join(CACHE_DIR, f"features_{key}.npz")
+
+
+def load_training_matrix(path=HISTORICAL_DATA_PATH, use_cache=True, event_features=False):
+    """
+    读历史明细 -> (X float32, y float32, 日期 datetime64[D], 特征名)，按 DEB_TIME 排序（时间序列切分的前提）
+    源文件大小 / 修改时间不变时直接读缓存
+    """
+    features = FEATURES + EVENT_FEATURES if event_features else FEATURES
+    if event_features and not os.path.exists(SHOW_SCHEDULE_PATH):
+        raise FileNotFoundError(f"--event-features needs the cleaned show schedule: {SHOW_SCHEDULE_PATH}")
+    cache = _cache_path(path, event_features)
+    if use_cache and os.path.exists(cache):
+        with np.load(cache) as data:
+            return data["X"], data["y"], data["dates"], features
+
+    df = pd.read_csv(path, usecols=FEATURES + [TARGET, TIME_COL], low_memory=False)
+    df[TIME_COL] = pd.to_datetime(df[TIME_COL], errors="coerce")
+    df = df[df[TARGET].notna() & df[TIME_COL].notna()].sort_values(TIME_COL, kind="stable")
+    if event_features:
+        shows = build_show_index(read_show_schedule())
+        df = pd.concat([df.reset_index(drop=True), shows.features(df[TIME_COL])], axis=1)
+    X = df[features].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float32)
+    y = df[TARGET].to_numpy(dtype=np.float32)
+    dates = df[TIME_COL].to_numpy(dtype="datetime64[D]")
+
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.savez(cache, X=X, y=y, dates=dates)
+    return X, y, dates, features
+
+
+def training_calendar(dates):
+    """训练数据的全园运营日历（有记录且不在闭园期的日期为开放日）"""
+    return build_operating_calendar(pd.DataFrame({"date": pd.to_datetime(dates), "attraction": "park"}))
+
+
+def time_series_folds(dates, calendar, n_folds=3, valid_days=VALID_OPEN_DAYS, end=None):
+    """
+    扩展窗口的时间序列 fold：[(train_end, valid_end), ...]（行下标，dates 已按时间排序）
+    每个验证窗口是 valid_days 个连续开放日，从 end（默认数据最后一天）往前依次排列；
+    窗口里有闭园 / 缺数据的日期时，整个窗口挪到缺口之前
+    """
+    end = pd.Timestamp(end if end is not None else dates[-1]).normalize()
+    window_end = calendar.previous_open_day(end + ONE_DAY)
+    windows = []
+    while len(windows) < n_folds and window_end is not None:
+        window_start = calendar.lag_open_day(window_end + ONE_DAY, valid_days)
+        if window_start is None:
+            break
+        if calendar.window_is_open(window_start, window_end):
+            windows.append((window_start, window_end))
+            window_end = calendar.previous_open_day(window_start)
+        else:
+            span = pd.date_range(window_start, window_end)
+            last_gap = span[~calendar.open_mask(span)][-1]
+            window_end = calendar.previous_open_day(last_gap)
+
+    if len(windows) < n_folds:
+        raise ValueError(f"Only {len(windows)} fully open {valid_days}-day windows found, need {n_folds}")
+
+    folds = []
+    for window_start, window_end in reversed(windows):
+        train_end = int(np.searchsorted(dates, np.datetime64(window_start.date()), side="left"))
+        valid_end = int(np.searchsorted(dates, np.datetime64(window_end.date()), side="right"))
+        folds.append((train_end, valid_end))
+    return folds
+
+
+def holdout_split(dates, calendar, holdout_days=HOLDOUT_OPEN_DAYS):
+    """
+    最后 holdout_days 个开放日作为测试集
+    返回 (测试集第一行的行下标, 测试集开始日期)；fold 只能用这一天之前的数据
+    """
+    last_open = calendar.previous_open_day(pd.Timestamp(dates[-1]).normalize() + ONE_DAY)
+    holdout_start = None if last_open is None else calendar.lag_open_day(last_open + ONE_DAY, holdout_days)
+    if holdout_start is None:
+        raise ValueError(f"Fewer than {holdout_days} open days, cannot hold out a test segment")
+    return int(np.searchsorted(dates, np.datetime64(holdout_start.date()), side="left")), holdout_start
+
+
+def build_fold_matrices(X, y, folds, max_bin=BASE_PARAMS["max_bin"]):
+    """每个 fold 建一次 QuantileDMatrix；验证集复用训练集的分箱 (ref)"""
+    matrices = []
+    for train_end, valid_end in folds:
+        dtrain = xgb.QuantileDMatrix(X[:train_end], y[:train_end], max_bin=max_bin)
+        dvalid = xgb.QuantileDMatrix(X[train_end:valid_end], y[train_end:valid_end], ref=dtrain, max_bin=max_bin)
+        matrices.append((dtrain, dvalid))
+    return matrices
+
+
+# -----------------------------
+# 搜索
+# -----------------------------
+def sample_configs(n_trials, seed=42):
+    """随机采样候选参数，第一个固定为 notebook 的参数"""
+    rng = np.random.default_rng(seed)
+    configs = [dict(BASE_PARAMS)]
+    seen = {json.dumps(configs[0], sort_keys=True)}
+    while len(configs) < n_trials and len(seen) < 10 * n_trials:
+        config = dict(BASE_PARAMS)
+        config.update({k: v[rng.integers(len(v))] for k, v in SEARCH_SPACE.items()})
+        config = {k: (v.item() if isinstance(v, np.generic) else v) for k, v in config.items()}
+        key = json.dumps(config, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def evaluate(config, matrices, num_rounds, nthread):
+    """一个候选在所有 fold 上训练（early stopping），返回平均验证 MAE 和平均最佳树数"""
+    params = dict(config, nthread=nthread)
+    scores, rounds = [], []
+    for dtrain, dvalid in matrices:
+        booster = xgb.train(params, dtrain, num_boost_round=num_rounds, evals=[(dvalid, "valid")],
+                            early_stopping_rounds=EARLY_STOPPING, verbose_eval=False)
+        scores.append(booster.best_score)
+        rounds.append(booster.best_iteration + 1)
+    return float(np.mean(scores)), int(np.mean(rounds))
+
+
+def successive_halving(configs, matrices, workers, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS,
+                       rate=HALVING_RATE):
+    """
+    连续减半：每轮所有存活候选并行训练 num_rounds 棵树，保留最好的 1/rate，下一轮树数 ×rate
+    返回 (最优候选, 所有试验记录)
+    """
+    nthread = max(1, (os.cpu_count() or 1) // workers)
+    trials = []
+    alive = list(range(len(configs)))
+    num_rounds = min_rounds
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            start = time.perf_counter()
+            results = list(pool.map(lambda i: evaluate(configs[i], matrices, num_rounds, nthread), alive))
+            for i, (score, best_rounds) in zip(alive, results):
+                trials.append({"trial": i, "num_rounds": num_rounds, "valid_mae": score,
+                               "best_rounds": best_rounds, **configs[i]})
+            print(f"🔎 {len(alive)} trials × {num_rounds} rounds: best MAE {min(r[0] for r in results):.4f} "
+                  f"({time.perf_counter() - start:.1f}s)")
+
+            if len(alive) == 1 or num_rounds >= max_rounds:
+                best = alive[int(np.argmin([r[0] for r in results]))]
+                return best, trials
+
+            keep = max(1, len(alive) // rate)
+            order = np.argsort([r[0] for r in results], kind="stable")[:keep]
+            alive = [alive[j] for j in order]
+            num_rounds = min(num_rounds * rate, max_rounds)
+
+
+# -----------------------------
+# 入口
+# -----------------------------
+def tune(path=HISTORICAL_DATA_PATH, n_trials=27, n_folds=3, workers=None, seed=42, event_features=False,
+         model_path=MODEL_PATH, metrics_path=METRICS_PATH):
+    workers = workers or min(4, os.cpu_count() or 1)
+    X, y, dates, features = load_training_matrix(path, event_features=event_features)
+    calendar = training_calendar(dates)
+    split, holdout_start = holdout_split(dates, calendar)
+    folds = time_series_folds(dates, calendar, n_folds, end=calendar.previous_open_day(holdout_start))
+    matrices = build_fold_matrices(X, y, folds)
+
+    configs = sample_configs(n_trials, seed)
+    best, trials = successive_halving(configs, matrices, workers)
+    trials_df = pd.DataFrame(trials)
+    best_trial = trials_df[trials_df["trial"] == best].iloc[-1]
+
+    # 最优参数在测试集之前的全部数据上重训，只在留出的测试集上评估
+    del matrices
+    dtrain = xgb.QuantileDMatrix(X[:split], y[:split], max_bin=configs[best]["max_bin"])
+    dtest = xgb.QuantileDMatrix(X[split:], y[split:], ref=dtrain, max_bin=configs[best]["max_bin"])
+    params = dict(configs[best], nthread=os.cpu_count() or 1)
+    booster = xgb.train(params, dtrain, num_boost_round=int(best_trial["best_rounds"]))
+    y_test = y[split:]
+    y_pred = booster.predict(dtest)
+
+    booster.save_model(model_path)
+    metrics = {
+        "params": configs[best],
+        "num_boost_round": int(best_trial["best_rounds"]),
+        "cv_valid_mae": float(best_trial["valid_mae"]),
+        "test_mae": float(np.mean(np.abs(y_pred - y_test))),
+        "test_rmse": float(np.sqrt(np.mean((y_pred - y_test) ** 2))),
+        "test_start": str(holdout_start.date()),
+        "test_rows": int(len(y_test)),
+        "features": features,
+        "n_rows": int(len(X)),
+        "folds": folds,
+        "trials": trials_df.to_dict(orient="records"),
+    }
+    with open(metrics_path, "w") as f:
+        json.dump(metrics, f, indent=2, default=str)
+    return metrics
+
+
+def train_intraday(start, end, model_path=INTRADAY_MODEL_PATH, alpha=0.5, phi=0.9, num_rounds=INTRADAY_ROUNDS):
+    """
+    训练日内多步预测模型
+    [start, end] 内每个开放日逐 tick 回放取样本；每天的典型等待基线和回放一样，
+    只用该日之前最近 365 个开放日（services.replay.replay_days），训练和回放的 typical_wait 特征同分布
+    最后 VALID_OPEN_DAYS 个开放日做 early stopping；真正的测试是回放 end 之后的日期
+    """
+    from services.replay import INTRADAY_FEATURES, intraday_training_set, replay_days
+
+    df = read_historical_data()
+    calendar = build_operating_calendar(df[["date", "attraction"]])
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    days = pd.date_range(start, end)
+    days = days[calendar.open_mask(days)]
+    if len(days) <= VALID_OPEN_DAYS:
+        raise ValueError(f"Need more than {VALID_OPEN_DAYS} open days in {start.date()} ~ {end.date()}")
+
+    train_days, valid_days = days[:-VALID_OPEN_DAYS], days[-VALID_OPEN_DAYS:]
+    X_train, y_train = intraday_training_set(replay_days(df, train_days, calendar), alpha, phi)
+    X_valid, y_valid = intraday_training_set(replay_days(df, valid_days, calendar), alpha, phi)
+
+    dtrain = xgb.DMatrix(X_train, label=y_train, feature_names=INTRADAY_FEATURES)
+    dvalid = xgb.DMatrix(X_valid, label=y_valid, feature_names=INTRADAY_FEATURES)
+    params = dict(BASE_PARAMS, nthread=os.cpu_count() or 1)
+    booster = xgb.train(params, dtrain, num_boost_round=num_rounds, evals=[(dvalid, "valid")],
+                        early_stopping_rounds=EARLY_STOPPING, verbose_eval=False)
+    booster = booster[:booster.best_iteration + 1]
+    booster.save_model(model_path)
+
+    y_pred = booster.predict(dvalid)
+    return {
+        "num_boost_round": booster.num_boosted_rounds(),
+        "valid_mae": float(np.mean(np.abs(y_pred - y_valid))),
+        "n_train": int(len(y_train)),
+        "n_valid": int(len(y_valid)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the XGBoost wait-time model")
+    parser.add_argument("--data", default=HISTORICAL_DATA_PATH)
+    parser.add_argument("--trials", type=int, default=27)
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--event-features", action="store_true", help="add TIME_TO_* / NEAR_* show features")
+    parser.add_argument("--intraday", action="store_true", help="train the intraday replay model instead")
+    parser.add_argument("--start", help="first training day for --intraday")
+    parser.add_argument("--end", help="last training day for --intraday")
+    args = parser.parse_args()
+
+    if args.intraday:
+        if not args.start or not args.end:
+            parser.error("--intraday requires --start and --end")
+        metrics = train_intraday(args.start, args.end)
+        print(f"✅ intraday model: valid MAE {metrics['valid_mae']:.4f}, {metrics['num_boost_round']} rounds, "
+              f"{metrics['n_train']} training rows -> {INTRADAY_MODEL_PATH}")
+        return
+
+    metrics = tune(args.data, args.trials, args.folds, args.workers, args.seed, args.event_features)
+    print(f"✅ best: test MAE {metrics['test_mae']:.4f}, RMSE {metrics['test_rmse']:.4f}, "
+          f"{metrics['num_boost_round']} rounds -> {MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,135 +6,36 @@ import streamlit as st
 import plotly.express as px
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
-
-# -----------------------------
-# 配置部分：根据自己实际情况修改
-# -----------------------------
-HISTORICAL_DATA_PATH = "/Users/kk_yang/Desktop/M2S2/Hackthon/Streamlit Dashboard/cleaned_data/merged_final_2.csv"
-MERGED_7_DAYS = "/Users/kk_yang/Desktop/M2S2/Hackthon/Streamlit Dashboard/merged_df.csv"
-
-# 原始数据/闭园信息时间范围
-DATA_START_DATE = pd.to_datetime("2018-06-01")
-DATA_END_DATE = pd.to_datetime("2022-07-26")   # 历史数据截至
-CLOSED_START = pd.to_datetime("2020-03-14")
-CLOSED_END = pd.to_datetime("2021-06-14")
-FAKE_START_DATE = pd.to_datetime("2022-07-27") # 假数据开始
-FAKE_END_DATE = pd.to_datetime("2022-08-02")   # 假数据结束
+from data.comparison import BASELINES, compare, delta_map
+from data.loader import DATA_END_DATE, DATA_START_DATE, FAKE_END_DATE
+from data.operating_calendar import CLOSED_START, CLOSED_END
+from data.shared import load_aggregate_store, load_join_indexes, load_operating_calendar, rows_between
+from models.model_loader import forecast_wait_times, load_wait_model
+from services.capacity_optimizer import TARGET_UTILIZATION, fit_demand_model, optimise_park_day
+from services.recommendations import recommend_units
 
 
 @st.cache_data
-def load_historical_data():
-    """
-    加载历史数据 (CSV)，仅包括 2018-06-01 ~ 2022-07-26
-    """
-    if not os.path.exists(HISTORICAL_DATA_PATH):
-        st.error(f"❌ Historical data file not found: {HISTORICAL_DATA_PATH}")
-        return None
-    
-    try:
-        df = pd.read_csv(
-            HISTORICAL_DATA_PATH,
-            encoding="utf-8",
-            low_memory=False,
-            on_bad_lines="skip"
-        )
-        # 重命名列
-        df.rename(columns={
-            "WORK_DATE": "date",
-            "ENTITY_DESCRIPTION_SHORT": "attraction",
-            "WAIT_TIME_MAX": "wait_time_max",
-            "attendance": "attendance",
-            "DEB_TIME_HOUR": "hour",
-            "DEB_TIME_ONLY": "time_slot",
-            "GUEST_CARRIED": "GUEST_CARRIED",
-            "CAPACITY": "CAPACITY"
-        }, inplace=True)
-
-        # 转成 datetime
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
-
-        # 填缺失
-        df.fillna({
-            "wait_time_max": 0,
-            "attendance": 0,
-            "GUEST_CARRIED": 0,
-            "CAPACITY": 1
-        }, inplace=True)
-
-        # 只保留 2022-07-26 及之前的记录
-        df = df[df["date"] <= DATA_END_DATE]
-
-        # capacity utilization
-        df["capacity_utilization"] = (
-            df["GUEST_CARRIED"] / df["CAPACITY"] * 100
-        )
-        return df
+def load_demand_model(_df_hist):
+    """等待时间 -> 每小时载客量 的按景点回归（只拟合一次）"""
+    return fit_demand_model(_df_hist)
 
-    except Exception as e:
-        st.error(f"❌ Error loading historical CSV: {e}")
-        return None
 
-@st.cache_data
-def load_fake_7days_data():
-    """
-    加载 7 天假数据 (Excel)，仅包括 2022-07-27 ~ 2022-08-02
-    """
-    if not os.path.exists(MERGED_7_DAYS):
-        st.error(f"❌ 7-day fake data file not found: {MERGED_7_DAYS}")
-        return None
-
-    try:
-        df_pred = pd.read_csv(MERGED_7_DAYS)
-
-        # 根据实际列名做重命名
-        df_pred.rename(columns={
-            "Date": "date",
-            "Attraction": "attraction",
-            "Wait_time_max": "wait_time_max"
-        }, inplace=True)
-
-        # 转成 datetime
-        df_pred["date"] = pd.to_datetime(df_pred["date"], errors="coerce")
-
-        # 如果某些列不存在，则补上默认值
-        if "hour" not in df_pred.columns:
-            df_pred["hour"] = 12
-        if "attendance" not in df_pred.columns:
-            df_pred["attendance"] = 0
-        if "GUEST_CARRIED" not in df_pred.columns:
-            df_pred["GUEST_CARRIED"] = 0
-        if "CAPACITY" not in df_pred.columns:
-            df_pred["CAPACITY"] = 1
-
-        # 只保留 2022-07-27 ~ 2022-08-02 之间的数据
-        df_pred = df_pred[
-            (df_pred["date"] >= FAKE_START_DATE) &
-            (df_pred["date"] <= FAKE_END_DATE)
-        ]
-
-        # 计算capacity_utilization
-        df_pred["capacity_utilization"] = (
-            df_pred["GUEST_CARRIED"] / df_pred["CAPACITY"] * 100
-        )
-
-        return df_pred
-
-    except Exception as e:
-        st.error(f"❌ Error loading 7-day fake data Excel: {e}")
-        return None
+@st.cache_resource
+def load_model():
+    """调好的等待时间模型（没有则为 None）"""
+    return load_wait_model()
 
 
 def show():
     st.title("📊 Daily Forecast & Recommendations")
 
     # -------------------------
-    # 1) 读取并缓存两份数据
+    # 1) 共享数据层：历史 (2018-06-01 ~ 2022-07-26) + 假数据 (2022-07-27 ~ 2022-08-02)
+    #    明细、运营日历、预聚合存储同源，整个应用只加载一次
     # -------------------------
-    df_hist = load_historical_data()  # 2018-06-01 ~ 2022-07-26
-    df_fake = load_fake_7days_data()  # 2022-07-27 ~ 2022-08-02
-
-    if df_hist is None or df_fake is None:
-        st.stop()
+    calendar = load_operating_calendar()
+    store = load_aggregate_store()
 
     # -------------------------
     # 2) 用户选日期，限制在 2018-06-01 ~ 2022-08-02
@@ -146,21 +47,20 @@ def show():
         max_value=FAKE_END_DATE.date()
     ))
 
-    # 如果在闭园期
-    if CLOSED_START <= date_selected <= CLOSED_END:
-        st.warning(
-            f"⚠️ The park was closed from {CLOSED_START.date()} to {CLOSED_END.date()}. No data available."
-        )
+    # 如果在闭园期（COVID 闭园，或 entity_schedule 里的全园关闭）
+    if calendar.is_closed(date_selected):
+        if CLOSED_START <= date_selected <= CLOSED_END:
+            st.warning(
+                f"⚠️ The park was closed from {CLOSED_START.date()} to {CLOSED_END.date()}. No data available."
+            )
+        else:
+            st.warning(f"⚠️ The park was closed on {date_selected.date()} (park schedule). No data available.")
         st.stop()
 
-    # 根据日期选择对应表
-    if date_selected <= DATA_END_DATE:
-        daily_df = df_hist[df_hist["date"] == date_selected]
-    elif date_selected <= FAKE_END_DATE:
-        daily_df = df_fake[df_fake["date"] == date_selected]
-    else:
+    if date_selected > FAKE_END_DATE:
         st.warning("Selected date is out of range.")
         st.stop()
+    daily_df = rows_between(date_selected)
 
     if daily_df.empty:
         st.warning("No data for the selected date.")
@@ -215,45 +115,19 @@ def show():
 
 
     # -------------------------
-    # 5) 计算前一天数据 => 用于显示 delta%
+    # 5) 对比基准 => 用于显示 delta%
+    #    由对比引擎在预聚合存储上一次查询完成，自动跳过闭园期和缺失日期
     # -------------------------
-    prev_date = date_selected - pd.Timedelta(days=1)
-
-    # 判定前一天是否在有效区间
-    if prev_date < DATA_START_DATE or prev_date > FAKE_END_DATE:
-        prev_attendance = None
-        prev_avg_wait = None
-        prev_peak_wait = None
-        prev_cap_util = None
-    else:
-        if prev_date <= DATA_END_DATE:
-            prev_df = df_hist[df_hist["date"] == prev_date]
-        else:
-            prev_df = df_fake[df_fake["date"] == prev_date]
-
-        prev_filtered = prev_df[prev_df["attraction"] == attraction_selected] if not prev_df.empty else pd.DataFrame()
-        if prev_filtered.empty:
-            prev_attendance = None
-            prev_avg_wait = None
-            prev_peak_wait = None
-            prev_cap_util = None
-        else:
-            prev_attendance = prev_filtered["attendance"].iloc[0] if "attendance" in prev_filtered.columns else 0
-            prev_avg_wait = round(prev_filtered["wait_time_max"].mean(), 2)
-            prev_peak_wait = round(prev_filtered["wait_time_max"].max(), 2)
-            prev_cap_util = round(prev_filtered["capacity_utilization"].mean(), 2)
-
-    def compute_delta_percent(today_val, prev_val):
-        # 若前一天无数据或 0，返回 None 不显示
-        if prev_val is None or prev_val == 0:
-            return None
-        change = (today_val - prev_val) / abs(prev_val) * 100.0
-        return round(change, 2)
-
-    delta_attendance = compute_delta_percent(attendance, prev_attendance)
-    delta_avg_wait = compute_delta_percent(avg_wait_time, prev_avg_wait)
-    delta_peak_wait = compute_delta_percent(peak_wait_time, prev_peak_wait)
-    delta_cap_util = compute_delta_percent(capacity_utilization, prev_cap_util)
+    baseline = st.selectbox("🔁 Compare Against", list(BASELINES), format_func=BASELINES.get)
+    deltas = delta_map(
+        compare(store, date_selected, date_selected, [attraction_selected],
+                baselines=(baseline,), calendar=calendar, freq="D"),
+        baseline
+    )
+    delta_attendance = deltas["attendance"]
+    delta_avg_wait = deltas["avg_wait"]
+    delta_peak_wait = deltas["peak_wait"]
+    delta_cap_util = deltas["capacity_utilization"]
 
     attendance_str = str(int(attendance))  # 整数格式
 
@@ -321,70 +195,45 @@ def show():
     # -------------------------
     st.subheader("🪄 **Recommendation:**")
     st.markdown("#### Ideal Units & Average Wait Time by 3-Hour Segments (09:00 ~ 21:00)")
-    time_segments = [(9, 12), (12, 15), (15, 18), (18, 21)]
-    table_data = []
-
-    max_avg_wait_time = 0
-    busiest_time_range = None  # 记录平均等待时间最长的时间段
-
-        # 确保 hour 列是整数类型
-    filtered_df["hour"] = pd.to_numeric(filtered_df["hour"], errors="coerce").astype("Int64")
-
-    # 计算时间段数据
-    for (start_h, end_h) in time_segments:
-        segment_label = f"{start_h:02d}:00-{end_h:02d}:00"
-        
-        # 现在 hour 列已经是整数，不会再报类型错误
-        sub_df = filtered_df[(filtered_df["hour"] >= start_h) & (filtered_df["hour"] < end_h)]
-
-        if sub_df.empty:
-            recommended_units = "/"
-            avg_wait_time_segment = 0  # 避免 None 影响比较
-        else:
-            # 1. 计算本时段累计载客数
-            guests_carried_seg = sub_df["GUEST_CARRIED"].sum()
-            
-            # 2. 从本时段数据中取出总容量、最大单元数（假设这两个值在时段内一致，取第一条记录）
-            total_capacity = sub_df["CAPACITY"].iloc[0]
-            nb_unit_max = sub_df["NB_MAX_UNIT"].iloc[0]
-
-            # 3. 计算每个单元的容量（若需要的话），这里暂时保留，但实际没用到
-            #    capacity_per_unit = total_capacity / nb_unit_max if nb_unit_max > 0 else 0
-
-            # 4. 计算平均等待时间（取整数）
-            avg_wait_time_segment = int(round(sub_df["wait_time_max"].mean()))
-
-            # 5. 根据新逻辑计算推荐的单位数：
-            #    recommended_units = guests_carried_seg / total_capacity
-            if total_capacity <= 0:
-                recommended_units = "/"
-            else:
-                # 用 ceil 向上取整
-                ideal_units_seg = np.ceil(guests_carried_seg / total_capacity)
-
-                # 约束：不能超过 NB_MAX_UNIT
-                if ideal_units_seg > nb_unit_max:
-                    ideal_units_seg = nb_unit_max
-
-                recommended_units = str(int(ideal_units_seg))
-
-        table_data.append({
-            "Time Range": segment_label,
-            "Recommended Ideal Units": recommended_units,
-            "Avg Wait Time (min)": avg_wait_time_segment
-        })
-        
-        if avg_wait_time_segment > max_avg_wait_time:
-            max_avg_wait_time = avg_wait_time_segment
-            busiest_time_range = segment_label
-
-    table_df = pd.DataFrame(table_data)
+    table_df, busiest_time_range, max_avg_wait_time = recommend_units(filtered_df)
     st.dataframe(table_df, hide_index=True)
 
     st.markdown(
         "> **Tips**: `/` indicates that the attraction is closed or no data is available in that time period."
     )
 
+    # -------------------------
+    # 全园单元优化：所有景点 × 时段一起求解，目标利用率 85%
+    # -------------------------
+    st.markdown(f"#### 🏗️ Park-wide Unit Plan ({TARGET_UTILIZATION:.0%} Utilization Target)")
+    staff_limit = st.number_input("👷 Staff Available per Time Segment (0 = unlimited)", min_value=0, value=0, step=1)
+    # 需求：历史日期用当天实际等待时间，之后的日期用调好的模型预测；容量用当天明细
+    wait_model = load_model()
+    if date_selected <= DATA_END_DATE:
+        wait_df = daily_df
+        st.caption("📈 Demand from the day's actual wait times")
+    elif wait_model is not None:
+        weather, shows = load_join_indexes()
+        wait_df = forecast_wait_times(daily_df, wait_model, weather, shows)
+        st.caption("🔮 Demand from the tuned XGBoost wait-time forecast")
+    else:
+        wait_df = None
+        st.info("No tuned wait-time model found (run `python -m models.tuning`), "
+                "so there is no demand forecast for dates after the historical data.")
+
+    if wait_df is not None:
+        plan_df = optimise_park_day(daily_df, wait_df, load_demand_model(rows_between(DATA_START_DATE, DATA_END_DATE)),
+                                    staff_limit=staff_limit or None)
+        col_plan, col_park = st.columns(2)
+        col_plan.dataframe(
+            plan_df[plan_df["attraction"] == attraction_selected].drop(columns="attraction"),
+            hide_index=True
+        )
+        col_park.dataframe(
+            plan_df.groupby("Time Range", as_index=False)[["units", "staff"]].sum(),
+            hide_index=True
+        )
+
     # -------------------------
     # 额外推荐策略: 部署 Food/Merchandise Carts
     # -------------------------
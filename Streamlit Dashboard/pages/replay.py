@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+import plotly.express as px
+from data.loader import DATA_END_DATE, DATA_START_DATE
+from services.notifications import build_notification_engine
+from data.shared import load_operating_calendar, rows_between
+from models.model_loader import load_intraday_model
+from services.replay import baseline_history, replay_day
+
+# -----------------------------
+# 模型 & 回放（明细来自共享数据层）
+# -----------------------------
+@st.cache_resource
+def load_model():
+    """日内 XGBoost 模型（没有则为 None）"""
+    return load_intraday_model()
+
+@st.cache_data
+def run_replay(date_str, alpha, phi, use_model):
+    """回放某一天（基线只用该日之前最近的开放日），按日期和参数缓存"""
+    date = pd.Timestamp(date_str)
+    history = rows_between(DATA_START_DATE, date - pd.Timedelta(days=1))
+    engine = build_notification_engine(baseline_history(history, date, load_operating_calendar()))
+    model = load_model() if use_model else None
+    return replay_day(rows_between(date), engine, alpha=alpha, phi=phi, model=model)
+
+# -----------------------------
+# Streamlit 界面
+# -----------------------------
+def show():
+    st.title("⏯️ Intraday Replay")
+
+    date_selected = pd.Timestamp(st.date_input(
+        "📅 Select a Date",
+        value=pd.to_datetime("2022-06-15"),
+        min_value=DATA_START_DATE.date(),
+        max_value=DATA_END_DATE.date()
+    ))
+    col1, col2 = st.columns(2)
+    alpha = col1.slider("Residual smoothing (alpha)", 0.1, 1.0, 0.5, 0.05)
+    phi = col2.slider("Residual decay per tick (phi)", 0.5, 1.0, 0.9, 0.01)
+
+    if rows_between(date_selected).empty:
+        st.warning("No data for the selected date.")
+        st.stop()
+
+    use_model = load_model() is not None
+    if use_model:
+        st.caption("🔮 Forecaster: intraday XGBoost (models/XGBoost_intraday.json)")
+    else:
+        st.caption("🔮 Forecaster: typical wait + decaying residual "
+                   "(train `python -m models.tuning --intraday` to use XGBoost)")
+
+    result = run_replay(str(date_selected.date()), alpha, phi, use_model)
+    ticks, horizon = result["ticks"], result["horizon"]
+
+    # 📊 延迟 & 精度
+    colA, colB, colC = st.columns(3)
+    colA.metric("⏱️ Ticks", len(ticks))
+    colB.metric("⚡ Mean Latency / Tick (ms)", round(ticks["latency_ms"].mean(), 3))
+    colC.metric("🐢 Max Latency / Tick (ms)", round(ticks["latency_ms"].max(), 3))
+
+    st.write("### 🎯 Forecast Accuracy vs Horizon")
+    fig = px.line(horizon, x="horizon_min", y=["mae", "baseline_mae"],
+                  labels={"horizon_min": "Horizon (min)", "value": "MAE (min)", "variable": "Forecast"})
+    st.plotly_chart(fig)
+
+    # 🎢 某个 tick 的预测 vs 实际
+    st.write("### 🔮 Forecast at a Tick")
+    attractions = result["attractions"]
+    attraction_selected = st.selectbox("🎢 Select an Attraction", attractions,
+                                       index=attractions.index("Roller Coaster") if "Roller Coaster" in attractions else 0)
+    slots = result["slots"]
+    if len(slots) < 2:
+        st.info("Not enough time slots on this day to show a forecast.")
+        st.stop()
+    if len(slots) == 2:
+        tick = 0  # 只有一个可预测的 tick，slider 的最小值和最大值相同会报错
+    else:
+        tick = st.slider("Tick", 0, len(slots) - 2, len(slots) // 3, format="%d")
+    a = attractions.index(attraction_selected)
+
+    chart_df = pd.DataFrame({
+        "time": slots,
+        "actual": result["actual"][:, a],
+        "forecast": np.concatenate([np.full(tick + 1, np.nan), result["forecasts"][tick][:, a]]),
+    })
+    fig = px.line(chart_df, x="time", y=["actual", "forecast"],
+                  labels={"time": "Time", "value": "Wait Time (min)", "variable": "Series"},
+                  title=f"{attraction_selected} - forecast made at {slots[tick].strftime('%H:%M')}")
+    st.plotly_chart(fig)
+
+if __name__ == "__main__":
+    show()
@@ -3,56 +3,22 @@ import pandas as pd
 import streamlit as st
 import plotly.express as px
 import numpy as np
-
-# -----------------------------
-# 配置部分
-# -----------------------------
-HISTORICAL_DATA_PATH = "/Users/kk_yang/Desktop/M2S2/Hackthon/Streamlit Dashboard/cleaned_data/merged_final_2.csv"
-DATA_START_DATE = pd.to_datetime("2018-06-01")
-DATA_END_DATE = pd.to_datetime("2022-07-26")
-
-@st.cache_data
-def load_historical_data():
-    """
-    加载历史数据 (CSV)
-    """
-    if not os.path.exists(HISTORICAL_DATA_PATH):
-        st.error(f"❌ Historical data file not found: {HISTORICAL_DATA_PATH}")
-        return None
-    
-    df = pd.read_csv(
-        HISTORICAL_DATA_PATH,
-        encoding="utf-8",
-        low_memory=False,
-        on_bad_lines="skip"
-    )
-    df.rename(columns={
-        "WORK_DATE": "date",
-        "ENTITY_DESCRIPTION_SHORT": "attraction",
-        "WAIT_TIME_MAX": "wait_time_max",
-        "attendance": "attendance",
-        "GUEST_CARRIED": "GUEST_CARRIED",
-        "CAPACITY": "CAPACITY",
-        "DEB_TIME_HOUR": "hour"
-    }, inplace=True)
-
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df.fillna({"wait_time_max": 0, "attendance": 0, "GUEST_CARRIED": 0, "CAPACITY": 1, "hour": 0}, inplace=True)
-    df = df[df["date"] <= DATA_END_DATE]
-    df["capacity_utilization"] = df["GUEST_CARRIED"] / df["CAPACITY"] * 100
-    return df
+from data.comparison import BASELINES, compare, delta_map
+from data.loader import DATA_END_DATE, DATA_START_DATE
+from data.shared import load_aggregate_store, load_operating_calendar, rows_between
 
 def show():
     st.title("📊 Yearly Forecast & Insights")
-    df_hist = load_historical_data()
-    if df_hist is None:
-        st.stop()
+    df_hist = rows_between(DATA_START_DATE, DATA_END_DATE)  # 共享明细里的历史部分
+    calendar = load_operating_calendar()
+    store = load_aggregate_store()
     
     # 选择年份，默认2019年
     selected_year = st.selectbox("📅 Select Year", sorted(df_hist["date"].dt.year.unique()), index=list(df_hist["date"].dt.year.unique()).index(2019))
     
     # 过滤数据
-    yearly_df = df_hist[df_hist["date"].dt.year == selected_year]
+    yearly_df = rows_between(pd.Timestamp(year=selected_year, month=1, day=1),
+                             pd.Timestamp(year=selected_year, month=12, day=31))
     
     if yearly_df.empty:
         st.warning("No data for the selected year.")
@@ -82,30 +48,23 @@ def show():
     else:
         busy_level = "🔴 High"
     
-    # 计算前一年数据
-    prev_year = selected_year - 1
-    prev_year_df = df_hist[df_hist["date"].dt.year == prev_year]
-    prev_filtered = prev_year_df[prev_year_df["attraction"] == attraction_selected] if not prev_year_df.empty else pd.DataFrame()
-    
-    def compute_delta_percent(today_val, prev_val):
-        if prev_val is None or prev_val == 0:
-            return None
-        change = (today_val - prev_val) / abs(prev_val) * 100.0
-        return round(change, 2)
-    
-    prev_attendance = prev_filtered.groupby("date")["attendance"].first().sum() if not prev_filtered.empty else None
-    prev_avg_wait = round(prev_filtered["wait_time_max"].mean(), 2) if not prev_filtered.empty else None
-    prev_peak_wait = prev_filtered["wait_time_max"].max() if not prev_filtered.empty else None  # 取前一年最大等待时间
-    prev_cap_util = round(prev_filtered["capacity_utilization"].mean(), 2) if not prev_filtered.empty else None
-    
-    delta_attendance = compute_delta_percent(total_attendance, prev_attendance)
-    delta_avg_wait = compute_delta_percent(avg_wait_time, prev_avg_wait)
-    delta_peak_wait = compute_delta_percent(peak_wait_time, prev_peak_wait)
-    delta_cap_util = compute_delta_percent(capacity_utilization, prev_cap_util)
+    # 对比基准（对比引擎在预聚合存储上一次查询，跳过整年无数据的年份）
+    baseline = st.selectbox("🔁 Compare Against", list(BASELINES), format_func=BASELINES.get)
+    deltas = delta_map(
+        compare(store, pd.Timestamp(year=selected_year, month=1, day=1), pd.Timestamp(year=selected_year, month=12, day=31),
+                [attraction_selected], baselines=(baseline,), calendar=calendar, freq="Y"),
+        baseline
+    )
+    delta_attendance = deltas["attendance"]
+    delta_avg_wait = deltas["avg_wait"]
+    delta_peak_wait = deltas["peak_wait"]
+    delta_cap_util = deltas["capacity_utilization"]
     
     # KPI 显示
     col1, col2, col3 = st.columns(3)
-    col1.metric("📊 Total Attendance", int(total_attendance), f"{delta_attendance}%" if delta_attendance is not None else None)
+    col1.metric("📊 Total Attendance", int(total_attendance),
+                f"{delta_attendance}% per open day" if delta_attendance is not None else None,
+                help="Period total. The change compares average attendance per open day with the baseline period.")
     col2.metric("🛎️ Avg Wait Time (min)", avg_wait_time, f"{delta_avg_wait}%" if delta_avg_wait is not None else None)
     col3.metric("📈 Peak Wait Time (min)", peak_wait_time, f"{delta_peak_wait}%" if delta_peak_wait is not None else None)
     
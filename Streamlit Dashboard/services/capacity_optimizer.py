@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+from services.recommendations import TIME_SEGMENTS
+
+# -----------------------------
+# 全园运营单元优化（目标利用率 85%）
+#   需求来自等待时间 -> 每小时载客量（按景点的线性回归，同 XGBoost.ipynb）
+#     历史日期用当天实际等待时间，之后的日期用调好的模型预测（models.model_loader.forecast_wait_times）
+#   容量来自当天明细：时段内实际存在的记录的 CAPACITY 之和 / NB_MAX_UNIT（不假设 15 分钟 / 1 小时粒度）
+#   需求 (景点, 时段) -> 每个景点每个时段开几个单元
+#   - 无人员约束：每个格子独立，直接 ceil(需求 / (85% × 单元容量))，截到 NB_MAX_UNIT
+#   - 有人员约束：每个时段是一个 0-1 背包问题；第 k 个单元的边际载客量随 k 递减（凹），
+#     按“边际载客量 / 所需人员”从高到低贪心，放不下的单元跳过、继续看后面人员更少的单元
+#     （贪心近似，不保证整数最优；同一景点选中的单元仍是前 n 个）
+#     整个园区一天 (A, S, K) 一次排序完成，每个时段再按排序结果扫描一遍
+# -----------------------------
+
+TARGET_UTILIZATION = 0.85
+
+
+def ideal_units(demand, unit_capacity, max_units, target=TARGET_UTILIZATION):
+    """
+    无人员约束的最优单元数 (A, S)
+    demand: (A, S) 预测载客需求；unit_capacity: (A, S) 或 (A, 1) 单个单元在该时段的容量
+    """
+    demand = np.asarray(demand, dtype=np.float64)
+    unit_capacity = np.asarray(unit_capacity, dtype=np.float64)
+    max_units = np.asarray(max_units, dtype=np.float64).reshape(-1, 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        units = np.ceil(demand / (target * unit_capacity))
+    units = np.where(np.isfinite(units), units, 0)
+    return np.clip(units, 0, max_units).astype(int)
+
+
+def optimise_units(demand, unit_capacity, max_units, staff_per_unit=None, staff_limit=None,
+                   target=TARGET_UTILIZATION):
+    """
+    全园单元分配
+    staff_per_unit: (A,) 每个单元需要的人员数，默认 1
+    staff_limit: 标量或 (S,) 每个时段可用人员上限；None 表示不限
+    返回 units (A, S)
+    """
+    units = ideal_units(demand, unit_capacity, max_units, target)
+    if staff_limit is None:
+        return units
+
+    demand = np.asarray(demand, dtype=np.float64)
+    n_attractions, n_segments = demand.shape
+    effective = target * np.broadcast_to(np.asarray(unit_capacity, dtype=np.float64), demand.shape)
+    staff = np.ones(n_attractions) if staff_per_unit is None else np.asarray(staff_per_unit, dtype=np.float64)
+    limit = np.broadcast_to(np.asarray(staff_limit, dtype=np.float64), (n_segments,))
+
+    # 第 k 个单元 (k = 1..K) 的边际载客量：min(单元容量, 剩余需求)
+    k_max = max(int(units.max(initial=0)), 1)
+    k = np.arange(k_max)
+    remaining = demand[:, :, None] - k * effective[:, :, None]
+    gain = np.clip(np.minimum(effective[:, :, None], remaining), 0, None)          # (A, S, K)
+    gain = np.where(k < units[:, :, None], gain, 0)                                # 不超过理想值 / NB_MAX_UNIT
+
+    # 每个时段：按 边际载客量 / 人员 降序扫描，放得下就选，放不下跳过（不在第一个放不下的单元处停止）
+    value = np.where(gain > 0, gain / staff[:, None, None], -np.inf)
+    value = value.transpose(1, 0, 2).reshape(n_segments, -1)                      # (S, A*K)
+    cost = np.repeat(staff, k_max)
+    order = np.argsort(-value, axis=1, kind="stable")
+    n_valid = np.isfinite(value).sum(axis=1)
+
+    take = np.zeros(value.shape, dtype=bool)
+    for s in range(n_segments):
+        left = limit[s]
+        for i in order[s, :n_valid[s]]:
+            if cost[i] <= left:
+                take[s, i] = True
+                left -= cost[i]
+    # 边际收益递减、同一景点人员相同 => 某个单元放不下时，同景点后面的单元也放不下，
+    # 选中的单元一定是前 n 个，直接计数
+    return take.reshape(n_segments, n_attractions, k_max).sum(axis=2).T
+
+
+def _segments(hours, time_segments):
+    """小时 -> 时段下标，不在任何时段内为 -1"""
+    edges = np.array([start for start, _ in time_segments] + [time_segments[-1][1]])
+    seg = np.searchsorted(edges, pd.to_numeric(hours, errors="coerce"), side="right") - 1
+    return np.where((seg >= 0) & (seg < len(time_segments)), seg, -1)
+
+
+def segment_capacity(day_df, time_segments=TIME_SEGMENTS):
+    """
+    单日明细 -> (景点列表, 单元容量 (A, S), NB_MAX_UNIT (A,))
+    单元容量 = 时段内实际存在的记录的 CAPACITY 之和 / NB_MAX_UNIT
+    CAPACITY 是每条记录（历史 15 分钟、假数据 1 小时）的总容量，直接求和即为时段总容量
+    """
+    seg = _segments(day_df["hour"].to_numpy(), time_segments)
+    keep = (seg >= 0) & day_df["attraction"].notna().to_numpy()
+
+    df = day_df.loc[keep, ["attraction", "CAPACITY", "NB_MAX_UNIT"]]
+    attractions = sorted(df["attraction"].astype(str).unique())
+    a = pd.Categorical(df["attraction"].astype(str), categories=attractions).codes
+
+    cap_sum = np.zeros((len(attractions), len(time_segments)))
+    np.add.at(cap_sum, (a, seg[keep]), df["CAPACITY"].fillna(0).to_numpy(dtype=np.float64))
+    max_units = df.groupby(a)["NB_MAX_UNIT"].max().reindex(range(len(attractions))).fillna(0).to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        unit_capacity = cap_sum / max_units[:, None]
+    unit_capacity = np.where(np.isfinite(unit_capacity), unit_capacity, 0)
+    return attractions, unit_capacity, max_units
+
+
+def fit_demand_model(history_df, wait_col="wait_time_max", guests_col="GUEST_CARRIED"):
+    """
+    每个景点：每小时载客量 ~ 每小时平均等待时间 的线性回归（XGBoost.ipynb 里按景点的 LinearRegression）
+    先聚合到 (景点, 日期, 小时)，与明细是 15 分钟还是 1 小时无关；闭式解，一次 groupby
+    返回 DataFrame，index = attraction，列 coef / intercept
+    """
+    hourly = history_df.groupby(["attraction", "date", "hour"], observed=True).agg(
+        x=(wait_col, "mean"), y=(guests_col, "sum")).reset_index()
+    hourly["xx"] = hourly["x"] ** 2
+    hourly["xy"] = hourly["x"] * hourly["y"]
+    sums = hourly.groupby("attraction")[["x", "y", "xx", "xy"]].sum()
+    n = hourly.groupby("attraction").size()
+
+    denom = n * sums["xx"] - sums["x"] ** 2
+    coef = ((n * sums["xy"] - sums["x"] * sums["y"]) / denom).where(denom > 0, 0.0)
+    intercept = (sums["y"] - coef * sums["x"]) / n
+    return pd.DataFrame({"coef": coef, "intercept": intercept})
+
+
+def forecast_demand(forecast_df, demand_model, attractions, time_segments=TIME_SEGMENTS, wait_col="wait_time_max"):
+    """
+    等待时间明细（当天实际明细或 forecast_wait_times 的预测）-> 需求 (A, S)
+    每个 (景点, 小时) 的平均预测等待代入回归得到每小时载客量，按时段求和；没有模型的景点需求为 0
+    """
+    hours = forecast_df["hour"] if "hour" in forecast_df.columns else pd.to_datetime(forecast_df["date"]).dt.hour
+    hourly = forecast_df.assign(hour=hours).groupby(["attraction", "hour"])[wait_col].mean().reset_index()
+    model = demand_model.reindex(hourly["attraction"])
+    guests = np.clip(model["intercept"].to_numpy() + model["coef"].to_numpy() * hourly[wait_col].to_numpy(), 0, None)
+
+    a = pd.Categorical(hourly["attraction"].astype(str), categories=attractions).codes
+    seg = _segments(hourly["hour"].to_numpy(), time_segments)
+    ok = (a >= 0) & (seg >= 0) & np.isfinite(guests)
+    demand = np.zeros((len(attractions), len(time_segments)))
+    np.add.at(demand, (a[ok], seg[ok]), guests[ok])
+    return demand
+
+
+def optimise_park_day(day_df, forecast_df, demand_model, time_segments=TIME_SEGMENTS, staff_per_unit=None,
+                      staff_limit=None, target=TARGET_UTILIZATION):
+    """
+    单日全园方案
+    day_df: 当天明细（容量 / NB_MAX_UNIT）；forecast_df: 当天等待时间（历史日期即 day_df，之后的日期为模型预测）
+    demand_model: fit_demand_model() 的结果
+    返回长表：attraction, Time Range, demand, units, max_units, utilization (%), staff
+    """
+    attractions, unit_capacity, max_units = segment_capacity(day_df, time_segments)
+    demand = forecast_demand(forecast_df, demand_model, attractions, time_segments)
+    if isinstance(staff_per_unit, dict):
+        staff_per_unit = np.array([staff_per_unit.get(a, 1) for a in attractions], dtype=np.float64)
+    units = optimise_units(demand, unit_capacity, max_units, staff_per_unit, staff_limit, target)
+
+    staff = np.ones(len(attractions)) if staff_per_unit is None else np.asarray(staff_per_unit, dtype=np.float64)
+    capacity = units * unit_capacity
+    with np.errstate(invalid="ignore", divide="ignore"):
+        utilization = np.where(capacity > 0, np.minimum(demand, capacity) / capacity * 100, np.nan)
+
+    labels = [f"{start:02d}:00-{end:02d}:00" for start, end in time_segments]
+    n_segments = len(time_segments)
+    return pd.DataFrame({
+        "attraction": np.repeat(attractions, n_segments),
+        "Time Range": np.tile(labels, len(attractions)),
+        "demand": np.round(demand.ravel(), 1),
+        "units": units.ravel(),
+        "max_units": np.repeat(max_units, n_segments).astype(int),
+        "utilization": np.round(utilization.ravel(), 1),
+        "staff": (units * staff[:, None]).ravel(),
+    })
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# 低等待时间通知候选
+#   每个 15 分钟时段，把所有景点的预测等待时间和
+#   “该景点在该星期几、该小时的典型等待时间”比较，排序后输出候选
+#   典型等待时间预先算成 (景点, 星期, 小时) 数组，每个时段只是一次数组比较
+# -----------------------------
+
+RATIO_THRESHOLD = 0.7   # 预测等待 <= 典型等待的 70% 才推送
+MAX_WAIT = 30           # 预测等待超过 30 分钟不推送
+MIN_TYPICAL_WAIT = 1.0  # 典型等待下限，避免除以接近 0 的数
+
+
+class NotificationEngine:
+    """
+    baseline[a, weekday, hour]: 景点 a 在星期 weekday、小时 hour 的历史平均等待时间
+    没有历史的格子为 NaN，打分时视为不开放（不推送）
+    """
+
+    def __init__(self, attractions, baseline, ratio_threshold=RATIO_THRESHOLD, max_wait=MAX_WAIT, top_k=None):
+        self.attractions = list(attractions)
+        self.attraction_index = {name: i for i, name in enumerate(self.attractions)}
+        self.baseline = np.maximum(np.asarray(baseline, dtype=np.float64), MIN_TYPICAL_WAIT)
+        self.ratio_threshold = ratio_threshold
+        self.max_wait = max_wait
+        self.top_k = top_k
+
+    def align(self, predicted):
+        """{景点: 等待时间} 或 Series -> 按 self.attractions 排好的数组（缺失为 NaN）"""
+        predicted = pd.Series(predicted, dtype=np.float64)
+        return predicted.reindex(self.attractions).to_numpy()
+
+    def score_slots(self, slots, predicted, open_mask=None):
+        """
+        批量打分
+        slots: (T,) 时段开始时间
+        predicted: (T, A) 预测等待时间，列顺序同 self.attractions，NaN 表示无预测 / 关闭
+        open_mask: 可选 (T, A) 或 (A,) 开放标记
+        返回 (ratio, rank, notify)，均为 (T, A)；rank 从 1 开始，1 = 相对最空闲
+        """
+        slots = pd.DatetimeIndex(pd.to_datetime(slots))
+        predicted = np.atleast_2d(np.asarray(predicted, dtype=np.float64))
+        typical = self.baseline[:, slots.weekday, slots.hour].T  # (T, A)
+
+        ratio = predicted / typical
+        valid = np.isfinite(ratio)
+        if open_mask is not None:
+            valid &= np.asarray(open_mask, dtype=bool)
+        ratio = np.where(valid, ratio, np.inf)
+
+        # 每个时段内按 ratio 升序排名
+        order = np.argsort(ratio, axis=1, kind="stable")
+        rank = np.argsort(order, axis=1) + 1
+
+        notify = valid & (ratio <= self.ratio_threshold) & (predicted <= self.max_wait)
+        if self.top_k is not None:
+            notify &= rank <= self.top_k
+        return np.where(valid, ratio, np.nan), rank, notify
+
+    def candidates(self, slots, predicted, open_mask=None):
+        """批量打分后只保留候选，返回长表"""
+        slots = pd.DatetimeIndex(pd.to_datetime(slots))
+        predicted = np.atleast_2d(np.asarray(predicted, dtype=np.float64))
+        ratio, rank, notify = self.score_slots(slots, predicted, open_mask)
+
+        t, a = np.nonzero(notify)
+        result = pd.DataFrame({
+            "slot": slots[t],
+            "attraction": np.asarray(self.attractions, dtype=object)[a],
+            "predicted_wait": predicted[t, a],
+            "typical_wait": self.baseline[a, slots.weekday[t], slots.hour[t]],
+            "ratio": ratio[t, a],
+            "rank": rank[t, a],
+        })
+        return result.sort_values(["slot", "rank"], ignore_index=True)
+
+    def stream(self, slot_stream, open_mask=None):
+        """
+        实时流：slot_stream 逐个产出 (时段, 预测)
+        预测为 {景点: 等待时间} / Series（按景点名对齐），或 (A,) 数组 / 列表（顺序同 self.attractions）
+        每个时段产出一张候选表
+        """
+        for slot, predicted in slot_stream:
+            if isinstance(predicted, (dict, pd.Series)):
+                predicted = self.align(predicted)
+            else:
+                predicted = np.asarray(predicted, dtype=np.float64)
+                if predicted.shape != (len(self.attractions),):
+                    raise ValueError(f"Expected {len(self.attractions)} predictions per slot, "
+                                     f"got shape {predicted.shape}")
+            yield self.candidates([slot], predicted[None, :], open_mask)
+
+
+def build_notification_engine(df, **kwargs):
+    """
+    从历史明细预计算 (景点, 星期, 小时) 典型等待时间，只扫描一次
+    没有历史的格子保留 NaN：该景点在这个星期几、这个小时从未运营，不能拿其他时段的均值充当典型值
+    """
+    df = df[df["attraction"].notna() & df["date"].notna()]
+    attractions = sorted(df["attraction"].astype(str).unique())
+    a = pd.Categorical(df["attraction"].astype(str), categories=attractions).codes
+    weekday = pd.to_datetime(df["date"]).dt.weekday.to_numpy()
+    hour = pd.to_numeric(df["hour"], errors="coerce").fillna(0).astype(int).clip(0, 23).to_numpy()
+    wait = df["wait_time_max"].to_numpy(dtype=np.float64)
+
+    total = np.zeros((len(attractions), 7, 24))
+    count = np.zeros((len(attractions), 7, 24))
+    np.add.at(total, (a, weekday, hour), wait)
+    np.add.at(count, (a, weekday, hour), 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        baseline = np.where(count > 0, total / count, np.nan)
+
+    return NotificationEngine(attractions, baseline, **kwargs)
+
+
+def open_slot_mask(calendar, attractions, slots):
+    """
+    各景点在各时段是否开放 (T, A)，来自运营日历的按时刻查询（entity_schedule 开放时段 / 临时关闭）
+    没有开放时段记录的日期退回按天判断
+    """
+    slots = pd.DatetimeIndex(pd.to_datetime(slots))
+    mask = np.zeros((len(slots), len(attractions)), dtype=bool)
+    for a, attraction in enumerate(attractions):
+        mask[:, a] = calendar.open_at_mask(attraction, slots)
+    return mask
+
+
+def predictions_from_forecast(engine, forecast_df):
+    """
+    预测表 (date, attraction, wait_time_max) -> (时段, 预测矩阵)，列顺序同 engine.attractions
+    """
+    wide = forecast_df.pivot_table(index="date", columns="attraction", values="wait_time_max", aggfunc="mean")
+    wide = wide.reindex(columns=engine.attractions)
+    return wide.index, wide.to_numpy(dtype=np.float64)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# 运营单元推荐（按 3 小时时段）
+#   从 daily 页面抽出，页面和 API 共用
+# -----------------------------
+
+TIME_SEGMENTS = [(9, 12), (12, 15), (15, 18), (18, 21)]
+
+
+def recommend_units(filtered_df, time_segments=TIME_SEGMENTS):
+    """
+    单个景点单日数据 -> 各时段推荐单元数和平均等待时间
+    返回 (table_df, busiest_time_range, max_avg_wait_time)
+    """
+    table_data = []
+
+    max_avg_wait_time = 0
+    busiest_time_range = None  # 记录平均等待时间最长的时间段
+
+    # 确保 hour 列是整数类型
+    hours = pd.to_numeric(filtered_df["hour"], errors="coerce").astype("Int64")
+
+    # 计算时间段数据
+    for (start_h, end_h) in time_segments:
+        segment_label = f"{start_h:02d}:00-{end_h:02d}:00"
+
+        sub_df = filtered_df[(hours >= start_h) & (hours < end_h)]
+
+        if sub_df.empty:
+            recommended_units = "/"
+            avg_wait_time_segment = 0  # 避免 None 影响比较
+        else:
+            # 1. 计算本时段累计载客数
+            guests_carried_seg = sub_df["GUEST_CARRIED"].sum()
+
+            # 2. 从本时段数据中取出总容量、最大单元数（假设这两个值在时段内一致，取第一条记录）
+            total_capacity = sub_df["CAPACITY"].iloc[0]
+            nb_unit_max = sub_df["NB_MAX_UNIT"].iloc[0]
+
+            # 3. 计算平均等待时间（取整数）
+            avg_wait_time_segment = int(round(sub_df["wait_time_max"].mean()))
+
+            # 4. 推荐单位数 = 累计载客数 / 总容量，向上取整，且不超过 NB_MAX_UNIT
+            if total_capacity <= 0:
+                recommended_units = "/"
+            else:
+                ideal_units_seg = min(np.ceil(guests_carried_seg / total_capacity), nb_unit_max)
+                recommended_units = str(int(ideal_units_seg))
+
+        table_data.append({
+            "Time Range": segment_label,
+            "Recommended Ideal Units": recommended_units,
+            "Avg Wait Time (min)": avg_wait_time_segment
+        })
+
+        if avg_wait_time_segment > max_avg_wait_time:
+            max_avg_wait_time = avg_wait_time_segment
+            busiest_time_range = segment_label
+
+    return pd.DataFrame(table_data), busiest_time_range, max_avg_wait_time
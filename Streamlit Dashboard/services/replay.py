@@ -0,0 +1,281 @@
+"""
+日内回放模拟器
+把某一天的 waiting_times 按 15 分钟逐个 tick 回放，
+每个 tick 增量更新滞后特征，把 (剩余时段 × 景点) 的特征矩阵一次送进日内 XGBoost 模型
+（models/XGBoost_intraday.json，直接多步预测），统计每个 tick 的耗时和不同预测步长的误差
+没有模型文件或没装 xgboost 时退回 典型等待 + 衰减残差
+
+运行:
+    python -m models.tuning --intraday --start 2022-01-01 --end 2022-05-31   # 先训练日内模型
+    python -m services.replay --date 2022-06-15
+    python -m services.replay --start 2022-06-01 --end 2022-06-30
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.notifications import MIN_TYPICAL_WAIT, build_notification_engine
+
+SLOT = pd.Timedelta(minutes=15)
+LAGS = (1, 2, 4)   # 滞后 15 / 30 / 60 分钟
+BASELINE_OPEN_DAYS = 365  # 典型等待基线只用回放日之前最近 365 个开放日
+
+# 日内模型特征：目标时段的典型等待 / 步长 / 小时 + 预测时刻的滞后值和残差
+INTRADAY_FEATURES = ["typical_wait", "horizon_min", "target_hour"] + \
+    [f"lag_{k * 15}min" for k in LAGS] + ["rolling_mean_1h", "residual_level"]
+
+
+def day_matrix(day_df, attractions):
+    """
+    单日明细 -> (时段, 实际等待矩阵 (T, A))，没有记录的格子为 NaN
+    """
+    if "DEB_TIME" in day_df.columns:
+        ts = pd.to_datetime(day_df["DEB_TIME"], errors="coerce")
+    else:
+        ts = pd.to_datetime(day_df["date"]) + pd.to_timedelta(day_df["time_slot"].astype(str))
+    ts = ts.dt.floor("15min")
+
+    slots = pd.date_range(ts.min(), ts.max(), freq=SLOT)
+    t = ((ts - slots[0]) // SLOT).fillna(-1).astype(np.int64).to_numpy()
+    a = pd.Categorical(day_df["attraction"].astype(str), categories=attractions).codes
+    ok = (a >= 0) & (t >= 0) & np.isfinite(day_df["wait_time_max"].to_numpy(dtype=np.float64))
+
+    actual = np.full((len(slots), len(attractions)), np.nan)
+    actual[t[ok], a[ok]] = day_df["wait_time_max"].to_numpy(dtype=np.float64)[ok]
+    return slots, actual
+
+
+class IntradayUpdater:
+    """
+    日内增量更新
+    - profile (T, A): 当天各时段的典型等待（来自 星期 × 小时 基线）
+    - level (A,)    : 实际 - 典型 的指数平滑残差，每个 tick O(A) 更新
+    - lags (A, L)   : 最近几个 tick 的实际值（环形缓冲）
+    - model         : 日内模型（有 predict(X) 即可），输入 features() 的 (H × A, F) 矩阵
+    只预测剩余时段，不重算当天已过去的部分；没有模型时预测 = 典型等待 + 残差 × phi^h
+    """
+
+    def __init__(self, profile, alpha=0.5, phi=0.9, lags=LAGS, hours=None, model=None):
+        self.profile = np.asarray(profile, dtype=np.float64)
+        self.alpha = alpha
+        self.phi = phi
+        self.lag_steps = tuple(lags)
+        self.model = model
+        n_slots, n_attractions = self.profile.shape
+        self.hours = np.zeros(n_slots) if hours is None else np.asarray(hours, dtype=np.float64)
+        self.level = np.zeros(n_attractions)
+        self.buffer = np.full((n_attractions, max(max(self.lag_steps), 4)), np.nan)
+        self.tick = -1
+
+    def update(self, observed):
+        """推进一个 tick，observed (A,) 为本时段实际等待，NaN 表示无观测"""
+        self.tick += 1
+        observed = np.asarray(observed, dtype=np.float64)
+        seen = np.isfinite(observed)
+
+        residual = observed - self.profile[self.tick]
+        self.level[seen] = self.alpha * residual[seen] + (1 - self.alpha) * self.level[seen]
+        # 没有观测的景点残差自然衰减
+        self.level[~seen] *= self.phi
+
+        # 环形缓冲右移一格；没有观测时沿用上一个值
+        last = self.buffer[:, 0].copy()
+        self.buffer = np.roll(self.buffer, 1, axis=1)
+        self.buffer[:, 0] = np.where(seen, observed, last)
+
+    def features(self):
+        """
+        剩余时段的模型输入 (H × A, F)，行顺序为 (时段, 景点)，列顺序同 INTRADAY_FEATURES
+        滞后值 / 残差是预测时刻的状态，对所有步长相同
+        """
+        remaining = self.profile[self.tick + 1:]
+        n_horizon, n_attractions = remaining.shape
+        recent = self.buffer[:, :4]
+        count = np.isfinite(recent).sum(axis=1)
+        rolling = np.where(count > 0, np.nansum(recent, axis=1) / np.maximum(count, 1), np.nan)
+
+        columns = [
+            remaining,
+            (np.arange(1, n_horizon + 1) * 15)[:, None],
+            self.hours[self.tick + 1:][:, None],
+        ] + [self.buffer[:, k - 1][None, :] for k in self.lag_steps] + [rolling[None, :], self.level[None, :]]
+        shape = (n_horizon, n_attractions)
+        X = np.stack([np.broadcast_to(col, shape) for col in columns], axis=-1)
+        return X.reshape(n_horizon * n_attractions, len(columns)).astype(np.float32)
+
+    def forecast(self):
+        """预测剩余时段 (H, A)，H = T - 当前 tick - 1"""
+        remaining = self.profile[self.tick + 1:]
+        if self.model is None or len(remaining) == 0:
+            decay = self.phi ** np.arange(1, len(remaining) + 1)
+            return np.maximum(remaining + decay[:, None] * self.level[None, :], 0)
+        pred = np.asarray(self.model.predict(self.features()), dtype=np.float64)
+        return np.maximum(pred.reshape(remaining.shape), 0)
+
+
+def baseline_history(df, date, calendar=None, open_days=BASELINE_OPEN_DAYS):
+    """
+    回放日之前最近 open_days 个开放日的明细（不含回放日，避免信息泄漏）
+    用运营日历往前数开放日，闭园期和缺数据的日期不占名额
+    """
+    date = pd.Timestamp(date).normalize()
+    mask = df["date"] < date
+    start = calendar.lag_open_day(date, open_days) if calendar is not None else None
+    if start is not None:
+        mask &= df["date"] >= start
+    return df[mask]
+
+
+def replay_days(df, days, calendar=None, open_days=BASELINE_OPEN_DAYS):
+    """
+    逐日产出 (日期, 当天明细, 通知引擎)，没有明细的日期跳过
+    每天的基线只用该日之前最近 open_days 个开放日；回放和日内模型训练都从这里取，两边的典型等待一致
+    """
+    for date in days:
+        day_df = df[df["date"] == date]
+        if day_df.empty:
+            continue
+        yield date, day_df, build_notification_engine(baseline_history(df, date, calendar, open_days))
+
+
+def day_profile(engine, slots):
+    """
+    用通知引擎的 (景点, 星期, 小时) 基线展开成当天的 (T, A) 典型等待
+    基线里没有历史的格子（通知视为不开放）回放时依次用“该景点该小时”、“该景点全天”的均值补，
+    当天有实际观测的时段必然在运营，残差需要一个有限的起点
+    """
+    baseline = engine.baseline
+    seen = np.isfinite(baseline)
+    total = np.where(seen, baseline, 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        by_hour = total.sum(axis=1) / seen.sum(axis=1)                 # (A, 24)
+        by_attraction = total.sum(axis=(1, 2)) / seen.sum(axis=(1, 2))  # (A,)
+    profile = baseline[:, slots.weekday, slots.hour]
+    profile = np.where(np.isnan(profile), by_hour[:, slots.hour], profile)
+    profile = np.where(np.isnan(profile), by_attraction[:, None], profile)
+    return np.nan_to_num(profile, nan=MIN_TYPICAL_WAIT).T
+
+
+def intraday_training_set(days, alpha=0.5, phi=0.9):
+    """
+    训练日内模型用的样本：逐日回放，每个 tick 取 features() 和剩余时段的实际值
+    days: 可迭代的 (日期, 单日明细, 通知引擎)，即 replay_days() 的输出；返回 (X (N, F) float32, y (N,))
+    """
+    Xs, ys = [], []
+    for _, day_df, engine in days:
+        slots, actual = day_matrix(day_df, engine.attractions)
+        updater = IntradayUpdater(day_profile(engine, slots), alpha=alpha, phi=phi, hours=slots.hour)
+        for t in range(len(slots) - 1):
+            updater.update(actual[t])
+            target = actual[t + 1:].ravel()
+            keep = np.isfinite(target)
+            Xs.append(updater.features()[keep])
+            ys.append(target[keep])
+    if not Xs:
+        return np.empty((0, len(INTRADAY_FEATURES)), dtype=np.float32), np.empty(0)
+    return np.concatenate(Xs), np.concatenate(ys)
+
+
+def replay_day(day_df, engine, alpha=0.5, phi=0.9, model=None):
+    """
+    回放一天；model 为日内模型（None 时用 典型等待 + 衰减残差）
+    返回 dict:
+      ticks      : 每个 tick 的耗时 (ms，含模型预测) 和观测景点数
+      horizon    : 各预测步长的 MAE（模型 vs 只用典型等待）
+      forecasts  : 每个 tick 做出的剩余时段预测
+      slots / actual / attractions
+    """
+    slots, actual = day_matrix(day_df, engine.attractions)
+    profile = day_profile(engine, slots)
+    updater = IntradayUpdater(profile, alpha=alpha, phi=phi, hours=slots.hour, model=model)
+
+    n_slots = len(slots)
+    err_sum = np.zeros(n_slots)
+    base_err_sum = np.zeros(n_slots)
+    err_count = np.zeros(n_slots)
+    tick_rows = []
+    forecasts = []
+
+    for t in range(n_slots):
+        start = time.perf_counter()
+        updater.update(actual[t])
+        pred = updater.forecast()
+        latency_ms = (time.perf_counter() - start) * 1000
+        forecasts.append(pred)
+        tick_rows.append({"slot": slots[t], "latency_ms": latency_ms, "observed": int(np.isfinite(actual[t]).sum())})
+
+        # 评估：第 h 行对应 t + h 时段
+        future = actual[t + 1:]
+        ok = np.isfinite(future)
+        h = np.arange(1, len(future) + 1)
+        err_sum[h] += np.where(ok, np.abs(pred - future), 0).sum(axis=1)
+        base_err_sum[h] += np.where(ok, np.abs(profile[t + 1:] - future), 0).sum(axis=1)
+        err_count[h] += ok.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        horizon = pd.DataFrame({
+            "horizon_min": np.arange(n_slots) * 15,
+            "mae": err_sum / err_count,
+            "baseline_mae": base_err_sum / err_count,
+            "n": err_count.astype(int),
+        }).iloc[1:]
+
+    return {
+        "ticks": pd.DataFrame(tick_rows),
+        "horizon": horizon[horizon["n"] > 0].reset_index(drop=True),
+        "forecasts": forecasts,
+        "slots": slots,
+        "actual": actual,
+        "attractions": engine.attractions,
+    }
+
+
+def main():
+    from data.loader import read_historical_data
+    from data.operating_calendar import build_operating_calendar
+    from models.model_loader import load_intraday_model
+
+    parser = argparse.ArgumentParser(description="Replay waiting times tick by tick, one open day at a time")
+    parser.add_argument("--date", help="replay a single day")
+    parser.add_argument("--start", help="replay every open day in [start, end]")
+    parser.add_argument("--end")
+    parser.add_argument("--alpha", type=float, default=0.5)
+    parser.add_argument("--phi", type=float, default=0.9)
+    args = parser.parse_args()
+    if not args.date and not args.start:
+        parser.error("--date or --start is required")
+
+    df = read_historical_data()
+    calendar = build_operating_calendar(df[["date", "attraction"]])
+    start = pd.Timestamp(args.date or args.start).normalize()
+    end = pd.Timestamp(args.date or args.end or args.start).normalize()
+    days = pd.date_range(start, end)
+    days = days[calendar.open_mask(days)]
+    if len(days) == 0:
+        raise SystemExit(f"No open days in {start.date()} ~ {end.date()}")
+
+    model = load_intraday_model()
+    print(f"🔮 forecaster: {'intraday XGBoost' if model is not None else 'typical wait + decaying residual'}")
+
+    horizons = []
+    for date, day_df, engine in replay_days(df, days, calendar):
+        result = replay_day(day_df, engine, alpha=args.alpha, phi=args.phi, model=model)
+        ticks = result["ticks"]
+        print(f"📅 {date.date()} | {len(ticks)} ticks | {len(result['attractions'])} attractions | "
+              f"latency per tick: mean {ticks['latency_ms'].mean():.3f} ms, max {ticks['latency_ms'].max():.3f} ms")
+        horizons.append(result["horizon"])
+
+    # 多天时按样本数加权汇总各步长的误差
+    horizon = pd.concat(horizons)
+    for col in ("mae", "baseline_mae"):
+        horizon[col] = horizon[col] * horizon["n"]
+    horizon = horizon.groupby("horizon_min", as_index=False)[["mae", "baseline_mae", "n"]].sum()
+    for col in ("mae", "baseline_mae"):
+        horizon[col] = horizon[col] / horizon["n"]
+    print(horizon.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from services.capacity_optimizer import fit_demand_model, forecast_demand, ideal_units, optimise_park_day, optimise_units
+
+
+def test_ideal_units_rounds_up_and_caps_at_max_units():
+    units = ideal_units([[170, 1000], [0, 50]], [[100, 100], [10, 10]], [5, 3])
+    np.testing.assert_array_equal(units, [[2, 5], [0, 3]])
+
+
+def test_unlimited_staff_matches_ideal_units():
+    demand, capacity, max_units = [[1000, 500], [300, 2000]], [[100, 100], [200, 200]], [10, 5]
+    np.testing.assert_array_equal(optimise_units(demand, capacity, max_units),
+                                  ideal_units(demand, capacity, max_units))
+
+
+def test_staff_limit_skips_units_that_do_not_fit():
+    """第二个时段：景点 1 的单元要 3 人、只剩 2 人，跳过后景点 2 的 1 人单元仍应补上"""
+    units = optimise_units([[1000, 500], [300, 2000], [50, 50]], [[100, 100], [200, 200], [10, 10]], [10, 5, 3],
+                           staff_per_unit=[1, 3, 1], staff_limit=8)
+    staff = units * np.array([1, 3, 1])[:, None]
+    np.testing.assert_array_equal(staff.sum(axis=0), [8, 8])
+    np.testing.assert_array_equal(units[:, 1], [6, 0, 2])
+
+
+def test_staff_limit_per_segment_and_never_above_ideal():
+    demand, capacity, max_units = [[400, 400], [400, 400]], [[100, 100], [100, 100]], [10, 10]
+    units = optimise_units(demand, capacity, max_units, staff_limit=[3, 100])
+    assert units[:, 0].sum() == 3
+    np.testing.assert_array_equal(units[:, 1], ideal_units(demand, capacity, max_units)[:, 1])
+
+
+def test_optimise_park_day_uses_the_day_wait_times():
+    """需求来自传入的等待时间：等待翻倍，需求和单元数都增加"""
+    hours = np.arange(9, 21)
+    history = pd.DataFrame({
+        "date": pd.Timestamp("2022-06-01"),
+        "attraction": "A",
+        "hour": np.tile(hours, 2),
+        "wait_time_max": np.repeat([10.0, 40.0], len(hours)),
+        "GUEST_CARRIED": np.repeat([100.0, 400.0], len(hours)),
+    })
+    history["date"] = history["date"] + pd.to_timedelta(np.repeat([0, 1], len(hours)), unit="D")
+    model = fit_demand_model(history)
+
+    day_df = pd.DataFrame({"date": pd.Timestamp("2022-06-03"), "attraction": "A", "hour": hours,
+                           "CAPACITY": 200.0, "NB_MAX_UNIT": 4, "wait_time_max": 10.0})
+    quiet = optimise_park_day(day_df, day_df, model)
+    busy = optimise_park_day(day_df, day_df.assign(wait_time_max=40.0), model)
+
+    np.testing.assert_allclose(forecast_demand(day_df, model, ["A"]).sum(), 100.0 * len(hours))
+    assert (busy["demand"] > quiet["demand"]).all()
+    assert (busy["units"] >= quiet["units"]).all() and busy["units"].sum() > quiet["units"].sum()
+    assert (quiet["utilization"].dropna() <= 100).all()
@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from data.aggregate_store import build_aggregate_store
+from data.comparison import baseline_windows, compare, delta_map
+from data.operating_calendar import build_operating_calendar
+
+T = pd.Timestamp
+
+
+def make_rows(dates, attraction="Roller Coaster", attendance=1000.0, wait=20.0):
+    dates = pd.DatetimeIndex(dates)
+    return pd.DataFrame({
+        "date": dates,
+        "attraction": attraction,
+        "wait_time_max": wait,
+        "capacity_utilization": 50.0,
+        "attendance": attendance,
+    })
+
+
+@pytest.fixture
+def partial_week():
+    """2022-06-06 那一周完整开放，下一周只开放周一到周三，每天客流相同"""
+    df = make_rows(list(pd.date_range("2022-06-06", "2022-06-12")) + list(pd.date_range("2022-06-13", "2022-06-15")))
+    return build_aggregate_store(df), build_operating_calendar(df[["date", "attraction"]])
+
+
+def test_same_weekday_last_year_daily_keeps_weekday():
+    [(start, end)] = baseline_windows(T("2022-06-15"), T("2022-06-15"), "same_weekday_last_year", freq="D")
+    assert start == end == T("2021-06-16")
+    assert start.dayofweek == T("2022-06-15").dayofweek
+
+
+def test_same_weekday_last_year_month_and_year_shift_one_year():
+    assert baseline_windows(T("2022-03-01"), T("2022-03-31"), "same_weekday_last_year", freq="M") == \
+        [(T("2021-03-01"), T("2021-03-31"))]
+    assert baseline_windows(T("2022-01-01"), T("2022-12-31"), "same_weekday_last_year", freq="Y") == \
+        [(T("2021-01-01"), T("2021-12-31"))]
+
+
+def test_same_period_2019_in_2019_has_no_baseline():
+    assert baseline_windows(T("2019-01-01"), T("2019-12-31"), "same_period_2019", freq="Y") == []
+
+    df = make_rows(pd.date_range("2019-06-01", "2019-06-30"))
+    store = build_aggregate_store(df)
+    deltas = delta_map(compare(store, T("2019-06-01"), T("2019-06-30"), baselines=("same_period_2019",), freq="M"),
+                       "same_period_2019")
+    assert all(value is None for value in deltas.values())
+
+
+def test_attendance_is_compared_per_open_day(partial_week):
+    store, calendar = partial_week
+    deltas = delta_map(compare(store, T("2022-06-13"), T("2022-06-19"), ["Roller Coaster"],
+                               baselines=("previous",), calendar=calendar, freq="W"), "previous")
+    # 3 天 vs 7 天，日均客流一样 => 0%，而不是 -57%
+    assert deltas["attendance"] == 0
+    assert deltas["avg_wait"] == 0
+
+
+def test_attendance_per_open_day_without_calendar(partial_week):
+    store, _ = partial_week
+    deltas = delta_map(compare(store, T("2022-06-13"), T("2022-06-19"), ["Roller Coaster"],
+                               baselines=("previous",), freq="W"), "previous")
+    assert deltas["attendance"] == 0
+
+
+def test_previous_day_follows_attraction_open_days():
+    df = pd.concat([
+        make_rows(pd.date_range("2022-06-01", "2022-06-10"), attraction="Zipline"),
+        make_rows(["2022-06-05", "2022-06-10"], attraction="Roller Coaster"),
+    ])
+    calendar = build_operating_calendar(df[["date", "attraction"]])
+    assert baseline_windows(T("2022-06-10"), T("2022-06-10"), "previous", calendar, freq="D",
+                            attractions=["Roller Coaster"]) == [(T("2022-06-05"), T("2022-06-05"))]
+    assert baseline_windows(T("2022-06-10"), T("2022-06-10"), "previous", calendar, freq="D") == \
+        [(T("2022-06-09"), T("2022-06-09"))]
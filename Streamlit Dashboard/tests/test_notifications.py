@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.operating_calendar import build_operating_calendar
+from services.notifications import build_notification_engine, open_slot_mask
+from services.replay import day_profile
+
+T = pd.Timestamp
+
+
+@pytest.fixture
+def history():
+    """两个景点，过去 4 周每天 10:00-17:59 有记录，典型等待 40 分钟"""
+    days = pd.date_range("2022-05-02", "2022-05-29")
+    hours = np.arange(10, 18)
+    df = pd.DataFrame([(d, a, h) for d in days for a in ("A", "B") for h in hours],
+                      columns=["date", "attraction", "hour"])
+    df["wait_time_max"] = 40.0
+    return df
+
+
+@pytest.fixture
+def calendar(history):
+    """6/1：A 按时段开放 10:00-18:00，B 当天没有时段记录（按天判断），6/2 都没有数据"""
+    df = pd.concat([history[["date", "attraction"]],
+                    pd.DataFrame({"date": [T("2022-06-01")] * 2, "attraction": ["A", "B"]})])
+    es = pd.DataFrame([{
+        "WORK_DATE": T("2022-06-01"),
+        "DEB_TIME": T("2022-06-01 10:00"),
+        "FIN_TIME": T("2022-06-01 18:00"),
+        "REF_CLOSING_DESCRIPTION": "Overture",
+        "ENTITY_TYPE": "ATTR",
+        "ENTITY_DESCRIPTION_SHORT": "A",
+    }])
+    return build_operating_calendar(df, entity_schedule=es, end="2022-06-02", closures=())
+
+
+def day_slots(date):
+    return pd.date_range(date, T(date) + pd.Timedelta(hours=23, minutes=45), freq="15min")
+
+
+def test_hours_without_history_stay_empty(history):
+    engine = build_notification_engine(history)
+    assert np.isnan(engine.baseline[:, :, :10]).all()
+    assert np.isnan(engine.baseline[:, :, 18:]).all()
+    assert np.allclose(engine.baseline[:, :, 10:18], 40.0)
+
+
+def test_no_candidates_outside_opening_hours(history, calendar):
+    engine = build_notification_engine(history)
+    slots = day_slots("2022-06-01")
+    predicted = np.full((len(slots), len(engine.attractions)), 5.0)  # 全天预测都很低
+
+    result = engine.candidates(slots, predicted, open_slot_mask(calendar, engine.attractions, slots))
+    assert not result.empty
+    assert result["slot"].dt.hour.between(10, 17).all()
+    assert set(result["attraction"]) == {"A", "B"}
+
+    # 没有历史的夜间时段，即使不传开放标记也不推送
+    result = engine.candidates(slots, predicted)
+    assert result["slot"].dt.hour.between(10, 17).all()
+
+
+def test_no_candidates_on_days_without_operation(history, calendar):
+    engine = build_notification_engine(history)
+    slots = day_slots("2022-06-02")
+    predicted = np.full((len(slots), len(engine.attractions)), 5.0)
+    assert engine.candidates(slots, predicted, open_slot_mask(calendar, engine.attractions, slots)).empty
+
+
+def test_replay_profile_fills_hours_without_history(history):
+    engine = build_notification_engine(history)
+    profile = day_profile(engine, day_slots("2022-06-01"))
+    assert np.isfinite(profile).all()
+    assert np.allclose(profile, 40.0)
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.operating_calendar import build_operating_calendar
+
+T = pd.Timestamp
+
+
+def make_schedule(rows):
+    """rows: (景点, 开始, 结束, 描述, 类型)"""
+    return pd.DataFrame([{
+        "WORK_DATE": T(deb).normalize(),
+        "DEB_TIME": T(deb),
+        "FIN_TIME": T(fin),
+        "REF_CLOSING_DESCRIPTION": label,
+        "ENTITY_TYPE": kind,
+        "ENTITY_DESCRIPTION_SHORT": name,
+    } for name, deb, fin, label, kind in rows])
+
+
+@pytest.fixture
+def calendar():
+    """
+    A：6/1、6/2 有数据，只有 6/2 有开放时段 10:00-18:00，6/2 14:00-15:00 临时关闭
+    B：只有 6/3 有数据
+    6/4 全天无数据，6/5 全园关闭（entity_schedule 中的 PARK 关闭）
+    """
+    df = pd.DataFrame({
+        "date": pd.to_datetime(["2022-06-01", "2022-06-02", "2022-06-03", "2022-06-06"]),
+        "attraction": ["A", "A", "B", "A"],
+    })
+    es = make_schedule([
+        ("A", "2022-06-02 10:00", "2022-06-02 18:00", "Overture", "ATTR"),
+        ("A", "2022-06-02 14:00", "2022-06-02 15:00", "Panne", "ATTR"),
+        ("Park", "2022-06-05 00:00", "2022-06-06 00:00", "Fermeture", "PARK"),
+    ])
+    return build_operating_calendar(df, entity_schedule=es, closures=())
+
+
+def test_open_at_falls_back_to_day_bitmap_on_unscheduled_days(calendar):
+    assert calendar.is_open_at("A", "2022-06-01 10:00")
+    assert calendar.is_open_at("A", "2022-06-01 03:00")
+    assert not calendar.is_open_at("A", "2022-06-03 10:00")
+
+
+def test_open_at_uses_intervals_on_scheduled_days(calendar):
+    mask = calendar.open_at_mask("A", pd.to_datetime([
+        "2022-06-02 09:30", "2022-06-02 10:00", "2022-06-02 14:30", "2022-06-02 17:59", "2022-06-02 18:00"]))
+    np.testing.assert_array_equal(mask, [False, True, False, True, False])
+
+
+def test_open_at_unknown_attraction_or_out_of_range(calendar):
+    assert not calendar.is_open_at("Nope", "2022-06-02 12:00")
+    assert not calendar.is_open_at("A", "2023-01-01 12:00")
+
+
+def test_park_closure_and_missing_days(calendar):
+    assert calendar.is_closed(T("2022-06-05"))
+    assert not calendar.is_closed(T("2022-06-04"))
+    assert not calendar.is_open(T("2022-06-04"))
+    assert list(calendar.missing_dates()) == [T("2022-06-04")]
+
+
+def test_previous_open_day_per_attraction(calendar):
+    assert calendar.previous_open_day(T("2022-06-06")) == T("2022-06-03")
+    assert calendar.previous_open_day(T("2022-06-06"), attractions="A") == T("2022-06-02")
+    assert calendar.previous_open_day(T("2022-06-03"), attractions="B") is None
+
+
+def test_lag_open_day_skips_closed_and_missing(calendar):
+    assert calendar.lag_open_day(T("2022-06-06"), 1) == T("2022-06-03")
+    assert calendar.lag_open_day(T("2022-06-06"), 3) == T("2022-06-01")
+    assert calendar.lag_open_day(T("2022-06-06"), 4) is None
+
+
+def test_window_is_open_and_open_days_between(calendar):
+    assert calendar.window_is_open(T("2022-06-01"), T("2022-06-03"))
+    assert not calendar.window_is_open(T("2022-06-03"), T("2022-06-05"))
+    assert calendar.open_days_between(T("2022-06-01"), T("2022-06-06")) == 4
+    assert calendar.open_days_between(T("2022-06-01"), T("2022-06-06"), attractions="B") == 1
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from data.validation import ATTENDANCE_RULES, WAITING_TIMES_RULES, carry_in_tail, neighbour_mean, validate
+
+
+def test_neighbour_mean_reuses_earlier_repairs_like_the_notebook():
+    values = np.array([10, 20, -1, 40, 50, -3, 70, 80], dtype=float)
+    repaired = neighbour_mean(values, values < 0, window=3)
+    assert repaired[2] == 38
+    assert round(repaired[5], 1) == 55.6
+
+
+def test_attendance_batch_uses_carry_in_and_drops_unrepaired_rows():
+    previous = pd.DataFrame({"USAGE_DATE": pd.date_range("2022-06-01", periods=4).astype(str),
+                             "FACILITY_NAME": "PortAventura World", "attendance": [100.0, 200.0, 300.0, 400.0]})
+    batch = pd.DataFrame({"USAGE_DATE": ["2022-06-05"], "FACILITY_NAME": "PortAventura World",
+                          "attendance": [-5.0]})
+
+    clean, quarantine, report = validate(batch, ATTENDANCE_RULES, "USAGE_DATE")
+    assert clean.empty and len(quarantine) == 1
+    assert report.loc[0, "dropped"] == 1
+
+    tail = carry_in_tail(previous, ATTENDANCE_RULES, "USAGE_DATE")
+    clean, quarantine, report = validate(batch, ATTENDANCE_RULES, "USAGE_DATE", tail)
+    assert clean["attendance"].tolist() == [300.0]
+    assert len(quarantine) == 1 and report.loc[0, "repaired"] == 1
+
+
+def test_ffill_follows_time_order_not_file_order():
+    batch = pd.DataFrame({
+        "DEB_TIME": ["2022-06-05 10:15:00", "2022-06-05 10:00:00", "2022-06-05 10:30:00"],
+        "ENTITY_DESCRIPTION_SHORT": "Roller Coaster",
+        "NB_UNITS": [-1, 2, 3],
+        "GUEST_CARRIED": [5, 6, 7],
+    }, index=[7, 8, 9])
+    clean, _, _ = validate(batch, WAITING_TIMES_RULES, "DEB_TIME")
+    assert clean.index.tolist() == [7, 8, 9]
+    assert clean.loc[7, "NB_UNITS"] == 2